@@ -1,14 +1,19 @@
 import streamlit as st
 import pandas as pd
-import tempfile
 import os
+import time
 import uuid
 from datetime import datetime, date
-from typing import List, Dict, Any
-from src.csv_processing import process_dashboard_csv, save_merged_csv
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dataclasses import replace
+from src.result_cache import ResultCache, process_upload
 from src.FileConfig import Files
+from src.what_if import compare_plans
+from src.jobs import FAILED, QUEUED, RUNNING, Job, JobQueue
+from src.csv_processing import ProgressEvent
 import logging
 from supabase import create_client, Client
+from src.local_backend import LocalSupabase
 
 # ------------------------
 # Page Setup
@@ -22,24 +27,30 @@ st.set_page_config(
 # ------------------------
 # Supabase Setup
 # ------------------------
-SUPABASE_URL = st.secrets["SUPABASE"]["url"]
-SUPABASE_KEY = st.secrets["SUPABASE"]["key"]
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# CALCULATOR_BACKEND=local swaps Supabase for an on-disk stand-in (tests, offline runs)
+LOCAL_BACKEND_DIR = os.path.join("processed_files", "local_backend")
+
+@st.cache_resource
+def get_supabase_client() -> Client:
+    """
+    One client per server process, reused by every rerun, session and job
+    worker, so its HTTP connections are kept alive instead of rebuilt.
+    """
+    if os.environ.get("CALCULATOR_BACKEND") == "local":
+        return LocalSupabase(LOCAL_BACKEND_DIR)
+    return create_client(st.secrets["SUPABASE"]["url"], st.secrets["SUPABASE"]["key"])
+
+supabase: Client = get_supabase_client()
 
 # ------------------------
 # Supabase Storage Helper (revised)
 # ------------------------
-def upload_to_supabase_bucket(local_path: str, bucket_name: str = "processed-files") -> str:
-    """Uploads a local CSV to Supabase Storage and returns its public URL."""
+def upload_to_supabase_bucket(file_bytes: bytes, file_name: str, bucket_name: str = "processed-files") -> str:
+    """Uploads a processed CSV held in memory to Supabase Storage and returns its public URL."""
     try:
         bucket = supabase.storage.from_(bucket_name)
 
-        # Open and read file bytes
-        with open(local_path, "rb") as f:
-            file_bytes = f.read()
-
         # Keep the same subfolder name for organization
-        file_name = os.path.basename(local_path)
         storage_key = f"processed_files/{file_name}"
 
         # Upload with proper content type
@@ -54,14 +65,141 @@ def upload_to_supabase_bucket(local_path: str, bucket_name: str = "processed-fil
         return public_url
 
     except Exception as e:
-        logging.error(f"Failed to upload {local_path} to Supabase Storage: {e}")
+        logging.error(f"Failed to upload {file_name} to Supabase Storage: {e}")
         return None
 
+# ------------------------
+# Background Calculator Jobs
+# ------------------------
+JOB_WORKERS = 2
+JOB_POLL_SECONDS = 1
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """One job queue per server, shared by every session and rerun."""
+    return JobQueue(max_workers=JOB_WORKERS)
+
+def run_calculation(
+    data: bytes,
+    config: Files,
+    original_name: str,
+    what_if_plans: Dict[str, Files],
+    on_progress: Optional[Callable[[ProgressEvent], None]] = None,
+) -> Dict[str, Any]:
+    """Process, archive, upload and log one calculation. Runs on a job worker, so no st.* calls."""
+    # The output is built once; the same bytes are archived and uploaded
+    what_if = len(what_if_plans) > 1
+    result, output = process_upload(data, config, RESULT_CACHE, on_progress=on_progress, with_table=what_if)
+    processed_fname = f"{config.client}_processed_{uuid.uuid4().hex[:6]}.csv"
+    processed_file_path = os.path.join(PROCESSED_DIR, processed_fname)
+    with open(processed_file_path, "wb") as f:
+        f.write(output)
+
+    # Upload processed file to Supabase Storage
+    public_url = upload_to_supabase_bucket(output, processed_fname)
+
+    # Log calculation to Supabase
+    log_calculation(config.client, original_name, processed_fname, public_url or processed_file_path)
+
+    # Keep only the archive's path: job results stay in memory until the queue forgets them
+    return {
+        "client": config.client,
+        "output_path": processed_file_path,
+        "calls": result.calls,
+        "minutes": result.minutes,
+        "charge": result.charge,
+        "summary": result.summary,
+        "what_if": compare_plans(result.table, what_if_plans).totals if what_if else None,
+        "preview": result.preview,
+    }
+
+def show_calculation_result(job_id: str, result: Dict[str, Any]):
+    st.subheader("Charge Summary")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Calls", f"{result['calls']:,}")
+    col2.metric("Chargeable Minutes", f"{result['minutes']:,}")
+    col3.metric("Estimated Charge", f"{result['charge']:,.0f}")
+    st.dataframe(result["summary"])
+    if result["what_if"] is not None:
+        st.subheader("What-if Comparison")
+        st.dataframe(result["what_if"])
+    st.subheader("Preview")
+    st.dataframe(result["preview"])
+
+    # Provide download, read from the archived file
+    if not os.path.exists(result["output_path"]):
+        st.warning("The processed file is no longer available on this server.")
+        return
+    with open(result["output_path"], "rb") as f:
+        st.download_button(
+            label="⬇️ Download Processed CSV",
+            data=f,
+            file_name=f"{result['client']}_processed.csv",
+            mime="text/csv",
+            key=f"download_{job_id}",
+        )
+    st.success("Processing complete. File is available for download and stored for admin review.")
+
+def show_progress(job: Job):
+    """Progress bar and running totals of a job that is still running."""
+    progress: Optional[ProgressEvent] = job.progress
+    if progress is None:
+        st.progress(0.0, text=f"Reading upload... {job.elapsed():.0f}s")
+        return
+    if progress.done:
+        st.progress(1.0, text=f"Saving, uploading and logging results... {job.elapsed():.0f}s")
+    else:
+        rows = f"{progress.rows:,} of ~{progress.total_rows:,} rows" if progress.total_rows else f"{progress.rows:,} rows"
+        st.progress(progress.fraction, text=f"Processed {rows} ({job.elapsed():.0f}s)")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Calls so far", f"{progress.calls:,}")
+    col2.metric("Chargeable Minutes so far", f"{progress.minutes:,}")
+    col3.metric("Estimated Charge so far", f"{progress.charge:,.0f}")
+
+def show_calculator_jobs(job_ids: List[str]):
+    """Status of this session's jobs, newest first; reruns the page while any is pending."""
+    jobs = [job for job in (JOB_QUEUE.get(job_id) for job_id in reversed(job_ids)) if job is not None]
+    if not jobs:
+        return
+    st.subheader("Your Calculations")
+    pending = False
+    for i, job in enumerate(jobs):
+        with st.expander(f"{job.name} [{job.status}]", expanded=(i == 0)):
+            if job.status == QUEUED:
+                pending = True
+                st.info(f"Waiting for a free worker ({JOB_QUEUE.position(job.id)} job(s) ahead).")
+            elif job.status == RUNNING:
+                pending = True
+                show_progress(job)
+            elif job.status == FAILED:
+                st.error(f"Processing failed: {job.error}")
+            else:
+                show_calculation_result(job.id, job.result)
+    if pending:
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
+
+# ------------------------
+# What-if Helper
+# ------------------------
+def what_if_variants(config: Files, minute_rates: str, second_rate: float) -> Dict[str, Files]:
+    """Current config plus one variant per alternative default rate."""
+    plans = {"Current": config}
+    for value in minute_rates.split(","):
+        if value.strip():
+            minute_rate = float(value)
+            plans[f"{minute_rate:g} per minute"] = replace(config, rate=minute_rate, rate_type="per_minute")
+    if second_rate:
+        plans[f"{second_rate:g} per second"] = replace(config, rate=second_rate, rate_type="per_second")
+    return plans
+
 # ------------------------
 # Directories (local cache for processed files)
 # ------------------------
 PROCESSED_DIR = "processed_files"
 os.makedirs(PROCESSED_DIR, exist_ok=True)
+RESULT_CACHE = ResultCache(os.path.join(PROCESSED_DIR, "cache"))
+JOB_QUEUE = get_job_queue()
 
 # ------------------------
 # Backend logging
@@ -110,35 +248,44 @@ def log_cdr_request(tenant_id: str, email: str, date_from: date, date_to: date,
 # ------------------------
 # Admin Utilities
 # ------------------------
-def parse_supabase_timestamp(ts: str) -> datetime:
+ADMIN_PAGE_SIZE = 50
+# Only the columns the admin page shows
+CALCULATOR_LOG_COLUMNS = ["client", "original_file", "processed_file", "file_path", "date_processed", "status"]
+CDR_REQUEST_COLUMNS = ["request_id", "tenant_id", "email", "date_from", "date_to", "reason", "date_submitted", "status"]
+
+def month_range(year: int, month: int) -> Tuple[str, str]:
+    """Start of the month and start of the next one, as ISO timestamps for range filters."""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+def fetch_page(table: str, columns: List[str], date_column: str, year: int = None, month: int = None,
+               page: int = 0, page_size: int = ADMIN_PAGE_SIZE) -> Tuple[List[Dict[str, Any]], int]:
     """
-    Converts Supabase TIMESTAMP string to datetime object, stripping trailing Z or fractional seconds if needed.
+    One page of a table, newest first, filtered to a month by the database.
+    Returns the rows and the number of rows matching the filter.
     """
-    ts_clean = ts.split('.')[0]  # remove fractional seconds
-    ts_clean = ts_clean.replace('Z','')  # remove trailing Z if UTC
-    return datetime.fromisoformat(ts_clean)
-
-def fetch_calculator_logs(month: int = None) -> List[Dict[str, Any]]:
-    logs = supabase.table("calculator_logs").select("*").execute().data
-    if month:
-        filtered = []
-        for log in logs:
-            dt = parse_supabase_timestamp(log["date_processed"])
-            if dt.month == month:
-                filtered.append(log)
-        logs = filtered
-    return logs
-
-def fetch_cdr_requests(month: int = None) -> List[Dict[str, Any]]:
-    requests = supabase.table("cdr_requests").select("*").execute().data
-    if month:
-        filtered = []
-        for req in requests:
-            dt = parse_supabase_timestamp(req["date_submitted"])
-            if dt.month == month:
-                filtered.append(req)
-        requests = filtered
-    return requests
+    query = supabase.table(table).select(",".join(columns), count="exact")
+    if year and month:
+        start, end = month_range(year, month)
+        query = query.gte(date_column, start).lt(date_column, end)
+    offset = page * page_size
+    response = query.order(date_column, desc=True).range(offset, offset + page_size - 1).execute()
+    return response.data, response.count or 0
+
+def fetch_calculator_logs(year: int = None, month: int = None, page: int = 0,
+                          page_size: int = ADMIN_PAGE_SIZE) -> Tuple[List[Dict[str, Any]], int]:
+    return fetch_page("calculator_logs", CALCULATOR_LOG_COLUMNS, "date_processed", year, month, page, page_size)
+
+def fetch_cdr_requests(year: int = None, month: int = None, page: int = 0,
+                       page_size: int = ADMIN_PAGE_SIZE) -> Tuple[List[Dict[str, Any]], int]:
+    return fetch_page("cdr_requests", CDR_REQUEST_COLUMNS, "date_submitted", year, month, page, page_size)
+
+def page_selector(total: int, key: str, page_size: int = ADMIN_PAGE_SIZE) -> int:
+    """Page picker for a result of total rows; returns the zero-based page."""
+    pages = max(1, -(-total // page_size))
+    selected = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key=key)
+    return int(selected) - 1
 
 def update_cdr_status(request_id: int, new_status: str):
     supabase.table("cdr_requests").update({"status": new_status}).eq("request_id", request_id).execute()
@@ -191,63 +338,45 @@ if page == "Calculator":
     s2c_rate = st.number_input("S2C Rate", min_value=0.0, value=0.0, format="%.2f")
     s2c_rate_type = st.selectbox("S2C Rate Type", RATE_TYPES, index=0)
 
+    st.subheader("What-if Comparison (optional)")
+    what_if_minute_rates = st.text_input("Alternative per-minute rates (comma separated, e.g. 680, 750)")
+    what_if_second_rate = st.number_input("Alternative per-second rate (0 to skip)", min_value=0.0, value=0.0, format="%.2f")
+
     if uploaded_file is not None and client.strip():
         if st.button("Process File"):
-            with st.spinner("Processing dashboard CSV... this may take a moment. Please wait."):
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp_input:
-                    tmp_input.write(uploaded_file.read())
-                    tmp_input.flush()
-                try:
-                    config = Files(
-                        client=client.strip(),
-                        dashboard=tmp_input.name,
-                        output="output.csv",
-                        carrier="Indosat",
-                        number1=number1 if number1 else None,
-                        number1_rate=number1_rate,
-                        number1_rate_type=number1_rate_type,
-                        number1_chargeable_call_types=number1_chargeable,
-                        number2=number2 if number2 else None,
-                        number2_rate=number2_rate,
-                        number2_rate_type=number2_rate_type,
-                        number2_chargeable_call_types=number2_chargeable,
-                        rate=rate,
-                        rate_type=rate_type,
-                        s2c=s2c if s2c else None,
-                        s2c_rate=s2c_rate,
-                        s2c_rate_type=s2c_rate_type,
-                        chargeable_call_types=chargeable_call_types,
-                    )
-                    call_details = process_dashboard_csv(config)
-                    processed_fname = f"{client}_processed_{uuid.uuid4().hex[:6]}.csv"
-                    processed_file_path = os.path.join(PROCESSED_DIR, processed_fname)
-                    save_merged_csv(call_details, processed_file_path)
-
-                    # Upload processed file to Supabase Storage
-                    public_url = upload_to_supabase_bucket(processed_file_path)
-                    
-                    # Log calculation to Supabase
-                    log_calculation(
-                        client.strip(),
-                        getattr(uploaded_file, "name", processed_fname),
-                        processed_fname,
-                        public_url or processed_file_path
-                    )
-
-                    # Provide download
-                    with open(processed_file_path, "rb") as f:
-                        st.download_button(
-                            label="⬇️ Download Processed CSV",
-                            data=f,
-                            file_name=f"{client}_processed.csv",
-                            mime="text/csv",
-                        )
-                    st.success("Processing complete. File is available for download and stored for admin review.")
-                finally:
-                    try:
-                        os.unlink(tmp_input.name)
-                    except Exception:
-                        pass
+            config = Files(
+                client=client.strip(),
+                dashboard=getattr(uploaded_file, "name", "upload.csv"),
+                output="output.csv",
+                carrier="Indosat",
+                number1=number1 if number1 else None,
+                number1_rate=number1_rate,
+                number1_rate_type=number1_rate_type,
+                number1_chargeable_call_types=number1_chargeable,
+                number2=number2 if number2 else None,
+                number2_rate=number2_rate,
+                number2_rate_type=number2_rate_type,
+                number2_chargeable_call_types=number2_chargeable,
+                rate=rate,
+                rate_type=rate_type,
+                s2c=s2c if s2c else None,
+                s2c_rate=s2c_rate,
+                s2c_rate_type=s2c_rate_type,
+                chargeable_call_types=chargeable_call_types,
+            )
+            try:
+                what_if_plans = what_if_variants(config, what_if_minute_rates, what_if_second_rate)
+            except ValueError:
+                st.warning("Alternative per-minute rates must be numbers separated by commas.")
+                what_if_plans = {}
+            original_name = getattr(uploaded_file, "name", "upload.csv")
+            job_id = JOB_QUEUE.submit(
+                f"{config.client} - {original_name}",
+                run_calculation, uploaded_file.getvalue(), config, original_name, what_if_plans,
+                report_progress=True,
+            )
+            st.session_state.setdefault("calculator_jobs", []).append(job_id)
+            st.success(f"Submitted job {job_id}. You can keep working; results appear below.")
     else:
         st.info("Please upload a dashboard CSV and enter Client ID to enable processing.")
 
@@ -260,6 +389,9 @@ if page == "Calculator":
                 del st.session_state[k]
         st.rerun()
 
+    # Polls (reruns the page) while a job is pending, so keep this last
+    show_calculator_jobs(st.session_state.get("calculator_jobs", []))
+
 # ------------------------
 # Request CDR Page (unchanged, now logs to Supabase)
 # ------------------------
@@ -289,17 +421,23 @@ elif page == "Admin Dashboard":
     if admin_pass != "supersecret":
         st.warning("Invalid password.")
     else:
-        # Select month filter (integer)
-        month = st.selectbox("Select Month", list(range(1,13)), index=datetime.now().month-1)
+        # Select month filter (year and month)
+        now = datetime.now()
+        year_col, month_col = st.columns(2)
+        year = year_col.selectbox("Select Year", list(range(now.year, now.year - 5, -1)))
+        month = month_col.selectbox("Select Month", list(range(1,13)), index=now.month-1)
 
         # Choose tab
         tab = st.radio("Admin Section", ["Processing Logs", "CDR Requests"])
 
         if tab == "Processing Logs":
-            logs = fetch_calculator_logs(month)
-            df_logs = pd.DataFrame(logs)
+            page_key = f"logs_page_{year}_{month}"
+            logs, total = fetch_calculator_logs(year, month, st.session_state.get(page_key, 1) - 1)
+            page_index = page_selector(total, page_key)
+            df_logs = pd.DataFrame(logs, columns=CALCULATOR_LOG_COLUMNS)
+            st.caption(f"{total} log(s) in {year}-{month:02d}")
             st.dataframe(df_logs)
-            st.download_button("⬇️ Download Logs CSV", df_logs.to_csv(index=False), f"calculator_logs_{month}.csv", "text/csv")
+            st.download_button("⬇️ Download Logs CSV", df_logs.to_csv(index=False), f"calculator_logs_{year}_{month:02d}_p{page_index + 1}.csv", "text/csv")
 
             # Download processed files
             for idx, row in df_logs.iterrows():
@@ -312,10 +450,13 @@ elif page == "Admin Dashboard":
                         st.download_button(f"⬇️ {fname}", f, fname, "text/csv", key=f"proc_{idx}")
 
         elif tab == "CDR Requests":
-            requests = fetch_cdr_requests(month)
-            df_req = pd.DataFrame(requests)
+            page_key = f"requests_page_{year}_{month}"
+            requests, total = fetch_cdr_requests(year, month, st.session_state.get(page_key, 1) - 1)
+            page_index = page_selector(total, page_key)
+            df_req = pd.DataFrame(requests, columns=CDR_REQUEST_COLUMNS)
+            st.caption(f"{total} request(s) in {year}-{month:02d}")
             st.dataframe(df_req)
-            st.download_button("⬇️ Download CDR Requests CSV", df_req.to_csv(index=False), f"cdr_requests_{month}.csv", "text/csv")
+            st.download_button("⬇️ Download CDR Requests CSV", df_req.to_csv(index=False), f"cdr_requests_{year}_{month:02d}_p{page_index + 1}.csv", "text/csv")
 
             st.markdown("#### Update Request Status")
             for i, rec in df_req.iterrows():
@@ -1,19 +1,136 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 from config import CONFIG
+from src.FileConfig import Files
 from src.csv_processing import (
+    DEFAULT_CHUNKSIZE,
+    process_dashboard_columnar,
     process_dashboard_csv,
+    rerate_processed_csv,
     save_merged_csv,
+    save_processed_frame,
+    stream_dashboard_csv,
 )
+from src.utils import classification_cache_stats, format_cache_stats
+
+ENGINES = ["rows", "columnar", "stream", "rerate"]
+
+
+def process_client(files: Files, engine: str = "columnar", chunksize: int = DEFAULT_CHUNKSIZE) -> dict:
+    """
+    Process one CONFIG entry and report how it went instead of raising.
+    """
+    started = time.perf_counter()
+    try:
+        print(f"> Processing dashboard file for client {files.client}")
+        if engine == "rows":
+            call_details = process_dashboard_csv(files)
+            save_merged_csv(call_details, files.output)
+            calls = len(call_details)
+        elif engine == "stream":
+            calls = stream_dashboard_csv(files, files.output, chunksize=chunksize)
+        elif engine == "rerate":
+            calls = rerate_processed_csv(files)
+        else:
+            processed = process_dashboard_columnar(files)
+            save_processed_frame(processed, files.output)
+            calls = len(processed)
+        return {
+            "client": files.client,
+            "ok": True,
+            "calls": calls,
+            "seconds": time.perf_counter() - started,
+            "error": None,
+        }
+    except Exception as e:
+        return failed_result(files, e, time.perf_counter() - started)
+
+
+def failed_result(files: Files, error: BaseException, seconds: float = 0.0) -> dict:
+    return {
+        "client": files.client,
+        "ok": False,
+        "calls": 0,
+        "seconds": seconds,
+        "error": f"{type(error).__name__}: {error}",
+    }
+
+
+def run_batch(configs: list[Files], workers: int, engine: str, chunksize: int) -> list[dict]:
+    """
+    Process every config, in a process pool when more than one worker is asked for.
+
+    A single worker runs in this process so the rows engine's classification
+    cache is shared by the whole batch; with a pool each worker process has
+    its own cache. The other engines classify each file's distinct numbers
+    once and do not use it.
+
+    A worker process that dies (e.g. killed for memory) breaks the pool: its
+    client and every client still waiting are reported as failed, and the
+    results already collected are kept.
+    """
+    if workers <= 1:
+        return [process_client(files, engine, chunksize) for files in configs]
+
+    results = [None] * len(configs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(process_client, files, engine, chunksize): i
+            for i, files in enumerate(configs)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # BrokenProcessPool, or a result that could not be sent back
+                result = failed_result(configs[i], e)
+            results[i] = result
+            print(f"< Finished {result['client']} ({'ok' if result['ok'] else 'failed'})")
+    return results
+
+
+def print_summary(results: list[dict], elapsed: float) -> None:
+    print("Summary:")
+    for result in results:
+        status = "ok" if result["ok"] else "FAILED"
+        line = f"  {result['client']:<30} {status:<7} {result['calls']:>9} calls {result['seconds']:8.1f}s"
+        if result["error"]:
+            line += f"  {result['error']}"
+        print(line)
+    failed = sum(not r["ok"] for r in results)
+    print(f"{len(results) - failed} succeeded, {failed} failed in {elapsed:.1f}s")
 
 
 def __main__():
+    parser = argparse.ArgumentParser(description="Process every dashboard file listed in config.py")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument("--engine", choices=ENGINES, default="columnar",
+                        help="rows: CallDetail reference path (with a classification cache shared "
+                             "across the batch when --workers is 1), columnar: whole-file columns, "
+                             "stream: columns in chunks with bounded memory, "
+                             "rerate: recompute Call charge in existing output files with current tariffs")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help="rows per chunk for the stream engine")
+    args = parser.parse_args()
+
     print("Starting Auto-Anna (Dashboard Only)")
-    for files in CONFIG:
-        print(f"> Processing dashboard file for client {files.client}")
-        call_details = process_dashboard_csv(
-            files.dashboard, files.carrier, client=files.client
-        )
-        save_merged_csv(call_details, files.output)
+    started = time.perf_counter()
+    workers = max(1, min(args.workers, len(CONFIG)))
+    results = run_batch(CONFIG, workers, args.engine, args.chunksize)
+    print_summary(results, time.perf_counter() - started)
+    if args.engine == "rows" and workers == 1:
+        print(f"Classification caches: {format_cache_stats(classification_cache_stats())}")
+
+    if any(not r["ok"] for r in results):
+        sys.exit(1)
     print("All files processed successfully")
 
 
-__main__()
+if __name__ == "__main__":
+    __main__()
@@ -0,0 +1,59 @@
+"""
+Memory held per processed call by the CallDetail path, on a synthetic export.
+
+Run from the repository root: python -m benchmarks.call_detail_memory [rows]
+"""
+import csv
+import gc
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+from src.FileConfig import Files
+from src.csv_processing import process_dashboard_csv
+
+NUMBERS = ["+62 812-3456-7890", "+6221 5098 1440", "+62 274 123456", "+1 415 555 0100", "112", "201"]
+CALL_TYPES = ["outbound call", "predictive_dial", "incoming call", "answering machine"]
+
+
+def write_synthetic_export(path: str, rows: int, seed: int = 62) -> None:
+    rng = random.Random(seed)
+    base = datetime(2025, 8, 1)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Sequence ID", "User name", "Call from", "Call to", "Call type", "Dial begin time",
+                         "Call begin time", "Call end time", "Ringing time", "Call duration", "Call memo"])
+        for i in range(rows):
+            start = base + timedelta(seconds=rng.randint(0, 30 * 86400))
+            duration = rng.randint(0, 900)
+            writer.writerow([
+                i, f"agent{rng.randint(1, 20)}", rng.choice(NUMBERS), rng.choice(NUMBERS) + str(i % 97),
+                rng.choice(CALL_TYPES), start.isoformat(sep=" "), "-", (start + timedelta(seconds=duration)).isoformat(sep=" "),
+                "0:00:05", f"0:{duration // 60:02d}:{duration % 60:02d}", "memo",
+            ])
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dashboard.csv")
+        write_synthetic_export(path, rows)
+        config = Files(client="bench", dashboard=path, output=os.path.join(tmp, "out.csv"), rate=720.0)
+
+        gc.collect()
+        tracemalloc.start()
+        call_details = process_dashboard_csv(config)
+        gc.collect()
+        held, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    print(f"calls:          {len(call_details)}")
+    print(f"memory held:    {held / 1e6:8.1f} MB")
+    print(f"bytes per call: {held / len(call_details):8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Micro-benchmark: prefix classification via PREFIX_INDEX vs the linear scan.
+
+Run from the repository root: python -m benchmarks.classify_number
+"""
+import random
+import timeit
+
+from src.utils import PREFIX_INDEX, _classify_prefix_scan, classify_prefix
+
+
+def sample_numbers(count: int = 10_000, seed: int = 62) -> list[str]:
+    rng = random.Random(seed)
+    prefixes = list(PREFIX_INDEX)
+    numbers = []
+    for _ in range(count):
+        tail = "".join(rng.choice("0123456789") for _ in range(rng.randint(4, 9)))
+        numbers.append(rng.choice(prefixes) + tail)
+    return numbers
+
+
+def main() -> None:
+    numbers = sample_numbers()
+    assert [classify_prefix(n) for n in numbers] == [_classify_prefix_scan(n) for n in numbers]
+
+    scan = min(timeit.repeat(lambda: [_classify_prefix_scan(n) for n in numbers], number=1, repeat=3))
+    index = min(timeit.repeat(lambda: [classify_prefix(n) for n in numbers], number=1, repeat=3))
+    per_call = 1e6 / len(numbers)
+    print(f"numbers:      {len(numbers)}")
+    print(f"linear scan:  {scan * per_call:8.2f} us/number")
+    print(f"prefix index: {index * per_call:8.2f} us/number")
+    print(f"speedup:      {scan / index:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
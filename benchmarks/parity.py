@@ -0,0 +1,143 @@
+"""
+Parity check: the processed CSV of a synthetic export, written by each path.
+
+Run from the repository root: python -m benchmarks.parity [rows]
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.FileConfig import Files
+from src.csv_processing import (
+    process_dashboard_chunks,
+    process_dashboard_columnar,
+    process_dashboard_csv,
+    save_merged_csv,
+    save_processed_frame,
+)
+from src.TariffPlan import compile_tariff_plan
+
+DASHBOARD_HEADER = ["Sequence ID", "User name", "Call from", "Call to", "Call type", "Dial begin time",
+                    "Call begin time", "Call end time", "Ringing time", "Call duration", "Call memo", "Extra"]
+# Trunk and zero-charge numbers, scancall, an extension and "0"
+CALL_FROM = ["+62 21-5098-1440", "2150913403", "scancall", "101", "+6281234567890", "622131141271",
+             "021 555 1234", "(021)5551234", "0"]
+# Emergency, toll-free, premium, international, domestic and unparseable numbers
+CALL_TO = ["+84 912345678", "+1 2025550123", "112", "0800123456", "+62 812 3456 7890", "+44 20 7946 0958",
+           "021-5555-0000", "8", "1500123", "+57 1234567", "abc", "62", "+63 21234567", "2150981440",
+           "2131141271", "809123"]
+CALL_TYPES = ["outbound call", "predictive_dial", "incoming call", "answering machine", "Internal Call",
+              "EXTENSION", "Call transfer", "AUTOMATIC_RECORD", "Monitoring", "play_sound", "Outbound Call"]
+USER_NAMES = ["alice", "bob", "", ""]
+MEMOS = ["", "note", "nan", "x, y", 'say "hi"']
+DURATIONS = [0, 1, 59, 60, 61, 125, 3599, 3600, 7322, 90061]
+
+CONFIGS = {
+    "siemens": Files(
+        client="siemens-id", dashboard="", output="", carrier="Telkom", rate=0.0,
+        number1="2150981440", number1_rate=720.0, number1_chargeable_call_types=["outbound call", "predictive_dial"],
+        number2="2150981440", number2_rate=1500.0, number2_chargeable_call_types=["incoming call", "answering machine"],
+        chargeable_call_types=["outbound call", "predictive dialer"],
+    ),
+    "per-second": Files(
+        client="tenant", dashboard="", output="", carrier="Indosat", rate=720.0, rate_type="per_second",
+        number1="2131141271", number1_rate=0.0, number1_chargeable_call_types=["incoming call"],
+        number2="215551234", number2_rate=333.3, number2_rate_type="per_second",
+        number2_chargeable_call_types=["outbound call"],
+        s2c="8", s2c_rate=500.5, s2c_rate_type="per_second",
+        chargeable_call_types=["outbound call", "predictive_dial"],
+    ),
+    "per-minute": Files(client="tenant", dashboard="", output="", rate=680, s2c_rate=0),
+    "any-call-type": Files(
+        client="tenant", dashboard="", output="", rate=700.33, rate_type="per_second", s2c_rate=0.0,
+    ),
+}
+
+
+def write_synthetic_export(path: str, rows: int, seed: int = 62, drop: tuple[str, ...] = ()) -> None:
+    """An export with duplicated calls and empty cells in every optional column, less the columns in drop."""
+    rng = random.Random(seed)
+    base = datetime(2025, 8, 1)
+    keep = [i for i, column in enumerate(DASHBOARD_HEADER) if column not in drop]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([DASHBOARD_HEADER[i] for i in keep])
+        for i in range(rows):
+            start = base + timedelta(days=rng.randint(0, 2), minutes=rng.randint(0, 1439), seconds=rng.randint(0, 3))
+            duration = rng.choice(DURATIONS)
+            start_text = start.strftime("%Y-%m-%d %H:%M:%S")
+            row = [
+                f"seq{i}", rng.choice(USER_NAMES), rng.choice(CALL_FROM), rng.choice(CALL_TO), rng.choice(CALL_TYPES),
+                start_text, rng.choice([start_text, "-"]), start_text,
+                f"0:00:{rng.randint(0, 30):02d}", str(timedelta(seconds=duration)).split(", ")[-1],
+                rng.choice(MEMOS), "z",
+            ]
+            writer.writerow([row[i] for i in keep])
+
+
+def read_text(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def check_row_writer(config: Files, workdir: str) -> None:
+    """save_merged_csv writes what DataFrame.to_csv wrote for the same calls."""
+    details = process_dashboard_csv(config)
+    written = os.path.join(workdir, "rows.csv")
+    save_merged_csv(details, written)
+
+    expected = pd.DataFrame(
+        [{**d.to_dict(), **dict(zip(["Round up duration (minutes)", "Round up duration (seconds)"],
+                                    d.round_up_duration()))} for d in details.values()]
+    ).to_csv(index=False)
+    assert read_text(written) == expected, "save_merged_csv differs from DataFrame.to_csv"
+
+    # Empty user names and memos are written blank, never as "nan"
+    output = pd.read_csv(written, dtype=str, keep_default_na=False)
+    for column in ("User name", "Call memo"):
+        assert not (output[column] == "nan").any(), f"{column}: 'nan' written"
+        assert (output[column] == "").any(), f"{column}: no empty cell exercised"
+
+
+def check_columnar(config: Files, workdir: str) -> None:
+    """The columnar and chunked paths write the same bytes as the CallDetail path."""
+    reference = os.path.join(workdir, "rows.csv")
+    save_merged_csv(process_dashboard_csv(config), reference)
+
+    columnar = os.path.join(workdir, "columnar.csv")
+    save_processed_frame(process_dashboard_columnar(config), columnar)
+    assert read_text(columnar) == read_text(reference), "process_dashboard_columnar differs"
+
+    # Small chunks, so duplicates land in different chunks
+    chunked = os.path.join(workdir, "chunked.csv")
+    save_merged_csv(process_dashboard_chunks(config.dashboard, compile_tariff_plan(config), chunksize=700), chunked)
+    assert read_text(chunked) == read_text(reference), "process_dashboard_chunks differs"
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 3_000
+    with tempfile.TemporaryDirectory() as workdir:
+        export = os.path.join(workdir, "dashboard.csv")
+        write_synthetic_export(export, rows)
+        for name, config in CONFIGS.items():
+            config.dashboard = export
+            check_row_writer(config, workdir)
+            check_columnar(config, workdir)
+            print(f"{name}: ok")
+
+        # An export without the optional text columns
+        export = os.path.join(workdir, "dashboard-no-memo.csv")
+        write_synthetic_export(export, rows, drop=("User name", "Call memo"))
+        for name, config in CONFIGS.items():
+            config.dashboard = export
+            check_columnar(config, workdir)
+            print(f"{name}, no user name or memo: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Micro-benchmark: normalise_phone_numbers (whole column) vs parse_phone_number per value.
+
+Run from the repository root: python -m benchmarks.phone_numbers
+"""
+import random
+import timeit
+
+import numpy as np
+
+from src.columnar import normalise_phone_numbers
+from src.utils import parse_phone_number
+
+# Values that exercise every branch of parse_phone_number
+EDGE_CASES = [
+    "scancall", "", "62", "6262", "0", "000", "+62 (812) 345-678", "62-21-555 0101",
+    "  08123 ", "1_000", "١٢٣", "12a", "abc", "+", "-5", "(0)", "6281234567890123456789",
+    "0062812", "150", "112", "800123",
+]
+
+
+def sample_numbers(count: int = 100_000, distinct: int = 5_000, seed: int = 62) -> list[str]:
+    rng = random.Random(seed)
+    formats = ["+62 {}", "62{}", "0{}", "({}) ", "{}-", "{}"]
+    pool = [
+        rng.choice(formats).format("".join(rng.choice("0123456789") for _ in range(rng.randint(3, 12))))
+        for _ in range(distinct)
+    ]
+    return [rng.choice(pool) for _ in range(count)] + EDGE_CASES
+
+
+def check_equivalent(values: list[str]) -> None:
+    numbers, non_numeric, text = normalise_phone_numbers(values)
+    for value, number, flagged, parsed_text in zip(values, numbers, non_numeric, text):
+        expected = parse_phone_number(value)
+        assert parsed_text == str(expected), (value, parsed_text, expected)
+        assert flagged == (not isinstance(expected, int)), (value, flagged)
+        if not flagged and abs(expected) <= np.iinfo(np.int64).max:
+            assert number == expected, (value, number, expected)
+
+
+def main() -> None:
+    values = sample_numbers()
+    check_equivalent(values)
+
+    scalar = min(timeit.repeat(lambda: [parse_phone_number(v) for v in values], number=1, repeat=3))
+    column = min(timeit.repeat(lambda: normalise_phone_numbers(values), number=1, repeat=3))
+    per_value = 1e6 / len(values)
+    print(f"values:            {len(values)}")
+    print(f"parse_phone_number: {scalar * per_value:8.3f} us/value")
+    print(f"column normaliser:  {column * per_value:8.3f} us/value")
+    print(f"speedup:            {scalar / column:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
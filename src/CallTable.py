@@ -0,0 +1,230 @@
+from dataclasses import dataclass, fields
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.CallDetail import CALL_DETAIL_COLUMNS
+from src.charges import format_charges, from_fixed
+
+OUTPUT_COLUMNS = CALL_DETAIL_COLUMNS + [
+    "Round up duration (minutes)",
+    "Round up duration (seconds)",
+]
+
+# Numbers above this many digits do not fit an int64 and are kept as text
+MAX_INT64_DIGITS = 18
+
+
+def encode_numbers(
+    numbers: pd.Series,
+    is_int: np.ndarray,
+    text_codes: dict[str, int],
+    values: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Encode parsed numbers (their text form plus an "is an integer" mask) as
+    int64. Integers are stored as themselves; anything else gets a negative
+    code, registered in text_codes.
+
+    Args:
+        values (Optional[np.ndarray]): The int64 numbers as
+            normalise_phone_numbers returns them (0 where they do not fit),
+            to use instead of parsing the text again.
+    """
+    numbers = numbers.astype(str)
+    is_int = np.asarray(is_int, dtype=bool)
+    codes = np.zeros(len(numbers), dtype=np.int64)
+    if values is None:
+        fits = is_int & (numbers.str.len() <= MAX_INT64_DIGITS).to_numpy()
+        codes[fits] = numbers[fits].astype("int64").to_numpy()
+    else:
+        # A 0 is either the number 0 or an integer too long for int64
+        fits = is_int & ((values != 0) | (numbers == "0").to_numpy())
+        codes[fits] = values[fits]
+    # Register each distinct text once, in order of first appearance
+    text_index, texts = pd.factorize(numbers[~fits], use_na_sentinel=False)
+    text_code = np.array(
+        [text_codes.setdefault(text, -(len(text_codes) + 1)) for text in texts], dtype=np.int64
+    )
+    codes[~fits] = text_code[text_index]
+    return codes
+
+
+def decode_numbers(codes: np.ndarray, texts: tuple[str, ...]) -> np.ndarray:
+    """Inverse of encode_numbers, texts being the registered texts in code order."""
+    out = codes.astype(str).astype(object)
+    negative = codes < 0
+    out[negative] = np.array(texts, dtype=object)[-codes[negative] - 1]
+    return out
+
+
+def format_durations(seconds: np.ndarray) -> np.ndarray:
+    """Format seconds like format_timedelta does (days are dropped)."""
+    remainder = pd.Series(seconds % 86400)
+    h = (remainder // 3600).astype(str)
+    m = (remainder % 3600 // 60).astype(str).str.zfill(2)
+    s = (remainder % 60).astype(str).str.zfill(2)
+    return (h + ":" + m + ":" + s).to_numpy(dtype=object)
+
+
+def format_datetimes(values: np.ndarray) -> np.ndarray:
+    """Format datetime64 values like format_datetime_as_human_readable ("-" for NaT)."""
+    return pd.Series(values).dt.strftime("%Y-%m-%d %H:%M:%S").astype(object).fillna("-").to_numpy()
+
+
+def wall_clock(values: pd.Series) -> np.ndarray:
+    """datetime64[ns] wall-clock times, dropping any timezone without shifting."""
+    index = pd.DatetimeIndex(values)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.as_unit("ns").to_numpy()
+
+
+@dataclass
+class CallTable:
+    """
+    Processed calls held column by column (struct of arrays).
+
+    Numbers are int64 (see encode_numbers), timestamps datetime64[ns] wall-clock
+    times, durations int64 seconds, charges int64 fixed point (see
+    src.charges), and repeated text (user names, call types, number types)
+    pandas Categoricals.
+    """
+    sequence_id: np.ndarray
+    user_name: pd.Categorical
+    call_from: np.ndarray
+    call_to: np.ndarray
+    number_texts: tuple[str, ...]
+    call_type: pd.Categorical
+    number_type: pd.Categorical
+    dial_start_at: np.ndarray
+    dial_answered_at: np.ndarray
+    dial_end_at: np.ndarray
+    ringing_time: np.ndarray
+    call_duration: np.ndarray
+    call_memo: np.ndarray
+    call_charge: np.ndarray
+    # Resolved fixed-point rate per call, and whether it is billed per second
+    call_rate: np.ndarray
+    per_second: np.ndarray
+    # True where the CallDetail path prints the charge as a float ("1440.0")
+    charge_as_float: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.call_duration)
+
+    def __getitem__(self, rows) -> "CallTable":
+        """Select rows with a slice, an index array or a boolean mask."""
+        values = {}
+        for f in fields(self):
+            value = getattr(self, f.name)
+            values[f.name] = value if f.name == "number_texts" else value[rows]
+        return CallTable(**values)
+
+    def filter(self, mask: np.ndarray) -> "CallTable":
+        return self[np.asarray(mask, dtype=bool)]
+
+    def is_number_type(self, *number_types: str) -> np.ndarray:
+        return np.asarray(self.number_type.isin(number_types))
+
+    def chargeable_minutes(self) -> np.ndarray:
+        """Started minutes of each charged call, 0 for calls charged nothing."""
+        return np.where(self.call_charge > 0, -(-self.call_duration // 60), 0)
+
+    def charges(self) -> np.ndarray:
+        """Charge per call in rupiah, as float64."""
+        return from_fixed(self.call_charge)
+
+    def total_charge(self) -> float:
+        return float(from_fixed(self.call_charge.sum()))
+
+    def charge_summary(self, by: str = "number_type") -> pd.DataFrame:
+        """
+        Calls, chargeable minutes and charge per value of a categorical column.
+        """
+        groups = pd.Series(getattr(self, by), name=by)
+        summary = pd.DataFrame({
+            "Calls": 1,
+            "Minutes": self.chargeable_minutes(),
+            "Charge": self.call_charge,
+        }).groupby(groups.to_numpy(), dropna=False, observed=True).sum()
+        summary["Charge"] = from_fixed(summary["Charge"].to_numpy())
+        return summary.sort_values("Charge", ascending=False)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Rows formatted exactly as save_merged_csv writes them."""
+        duration_of_day = self.call_duration % 86400
+        number_type = np.asarray(self.number_type, dtype=object)
+        return pd.DataFrame(
+            {
+                "Sequence ID": self.sequence_id,
+                "User name": np.asarray(self.user_name, dtype=object),
+                "Call from": decode_numbers(self.call_from, self.number_texts),
+                "Call to": decode_numbers(self.call_to, self.number_texts),
+                "Call type": np.asarray(self.call_type, dtype=object),
+                "Number type": np.where(pd.isna(number_type), None, number_type),
+                "Dial starts at": format_datetimes(self.dial_start_at),
+                "Dial answered at": format_datetimes(self.dial_answered_at),
+                "Dial ends at": format_datetimes(self.dial_end_at),
+                "Ringing time": format_durations(self.ringing_time),
+                "Call duration": format_durations(self.call_duration),
+                "Call memo": self.call_memo,
+                "Call charge": format_charges(
+                    self.call_duration, self.call_rate, self.per_second, self.charge_as_float
+                ),
+                "Round up duration (minutes)": -(-duration_of_day // 60),
+                "Round up duration (seconds)": duration_of_day,
+            },
+            columns=OUTPUT_COLUMNS,
+        )
+
+    @classmethod
+    def from_columns(
+        cls,
+        sequence_id,
+        user_name,
+        call_from: pd.Series,
+        from_is_int: np.ndarray,
+        call_to: pd.Series,
+        to_is_int: np.ndarray,
+        call_type,
+        number_type,
+        dial_start_at: pd.Series,
+        dial_answered_at: pd.Series,
+        dial_end_at: pd.Series,
+        ringing_time: np.ndarray,
+        call_duration: np.ndarray,
+        call_memo,
+        call_charge: np.ndarray,
+        call_rate: np.ndarray,
+        per_second: np.ndarray,
+        charge_as_float: np.ndarray,
+        from_number: Optional[np.ndarray] = None,
+        to_number: Optional[np.ndarray] = None,
+    ) -> "CallTable":
+        """
+        Build a table from parsed columns (numbers as text plus integer mask,
+        optionally their int64 values, see encode_numbers; charges in
+        fixed-point units).
+        """
+        text_codes: dict[str, int] = {}
+        return cls(
+            sequence_id=np.asarray(sequence_id, dtype=object),
+            user_name=pd.Categorical(np.asarray(user_name, dtype=object)),
+            call_from=encode_numbers(pd.Series(call_from), from_is_int, text_codes, from_number),
+            call_to=encode_numbers(pd.Series(call_to), to_is_int, text_codes, to_number),
+            number_texts=tuple(text_codes),
+            call_type=pd.Categorical(np.asarray(call_type, dtype=object)),
+            number_type=pd.Categorical(np.asarray(number_type, dtype=object)),
+            dial_start_at=wall_clock(dial_start_at),
+            dial_answered_at=wall_clock(dial_answered_at),
+            dial_end_at=wall_clock(dial_end_at),
+            ringing_time=np.asarray(ringing_time, dtype=np.int64),
+            call_duration=np.asarray(call_duration, dtype=np.int64),
+            call_memo=np.asarray(call_memo, dtype=object),
+            call_charge=np.asarray(call_charge, dtype=np.int64),
+            call_rate=np.asarray(call_rate, dtype=np.int64),
+            per_second=np.asarray(per_second, dtype=bool),
+            charge_as_float=np.asarray(charge_as_float, dtype=bool),
+        )
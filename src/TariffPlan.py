@@ -0,0 +1,157 @@
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from src.FileConfig import Files
+from src.international_rates import INTERNATIONAL_RATE_INDEX, normalise_rate_label
+
+SPECIAL_ZERO_CHARGE_CALLERS = frozenset({
+    "2150913403",
+    "85161662298",
+    "85157455618",
+    "82248400487",
+    "2150913400",
+    "2131141271",
+})
+ZERO_CHARGE_CLIENT = "siemens-id"
+
+DEFAULT_CHARGEABLE_CALL_TYPES = frozenset({"outbound call", "predictive_dial"})
+S2C_CALL_TYPES = frozenset({"incoming call", "answering machine"})
+# Emergency numbers are left out: the old CallDetail chain compared the
+# lowercased number type with the capitalised EMERGENCY_NUMBERS labels, so
+# they never got the premium rate and are charged like any other number.
+PREMIUM_NUMBER_TYPES = frozenset({"premium call", "toll-free", "split charge"})
+RATE_TYPES = frozenset({"per_minute", "per_second"})
+
+PREMIUM_RATE = 1700
+FALLBACK_RATE = 720
+
+
+def _rate_type(value: Optional[str], default: Optional[str] = None) -> Optional[str]:
+    """Keep only rate types the charge functions know; others never match."""
+    value = value or default
+    return value if value in RATE_TYPES else None
+
+
+@dataclass(frozen=True)
+class NumberRate:
+    number: Optional[str]
+    call_types: frozenset[str]
+    rate: float
+    rate_type: Optional[str]
+
+
+@dataclass(frozen=True)
+class TariffPlan:
+    """
+    A Files config compiled once for rating calls.
+
+    Call types are lowercased into frozensets and rates are resolved up front
+    (missing rates become 0, special-number rates of 0 become 720), so rating
+    a call is a handful of set and dict lookups.
+    """
+    client: str
+    carrier: str
+    zero_charge_callers: frozenset[str]
+    chargeable_call_types: frozenset[str]
+    general_call_types: frozenset[str]
+    rate: float
+    rate_type: Optional[str]
+    s2c_numbers: frozenset
+    s2c_rate: float
+    s2c_rate_type: Optional[str]
+    number_rates: tuple[NumberRate, ...]
+    international_rates: Mapping[str, float] = field(hash=False)
+
+    def international_rate(self, number_type: str) -> Optional[float]:
+        """Per-minute rate for an "International - XXX" label, None if unrated."""
+        return self.international_rates.get(normalise_rate_label(number_type))
+
+    def resolve_rate(
+        self, call_type: str, number_type: str, call_from: str, call_to: str
+    ) -> tuple[float, str]:
+        """
+        Return the (rate, rate_type) that applies to one call.
+
+        Expects the lowercased call type and number type, and the numbers as
+        the stripped strings calculate_call_charge compares. The column
+        version is src.charge_rules.CHARGE_RULES; keep the order in step.
+        """
+        # Siemens special handling
+        if call_from in self.zero_charge_callers:
+            return 0, "per_minute"
+
+        # Excluded number type
+        if number_type == "internal call":
+            return 0, "per_minute"
+
+        # Premium / Toll-free / Split charge
+        if number_type in PREMIUM_NUMBER_TYPES:
+            return PREMIUM_RATE, "per_minute"
+
+        base_rate = self.international_rate(number_type)
+        if base_rate:
+            return base_rate, "per_minute"
+
+        # S2C logic
+        if self.s2c_rate_type and ((call_to or call_from) in self.s2c_numbers or number_type == "scancall"):
+            if call_type in S2C_CALL_TYPES or call_type in self.chargeable_call_types:
+                return self.s2c_rate, self.s2c_rate_type
+
+        # Number 1 / Number 2
+        for special in self.number_rates:
+            if special.rate_type and call_type in special.call_types and special.number in (call_to, call_from):
+                return special.rate, special.rate_type
+
+        # Fallback to general config
+        if self.rate_type and (not self.general_call_types or call_type in self.general_call_types):
+            return self.rate, self.rate_type
+
+        # Excluded call types
+        if call_type not in self.chargeable_call_types:
+            return 0, "per_minute"
+
+        return FALLBACK_RATE, "per_minute"
+
+
+def _lowered(call_types) -> frozenset[str]:
+    return frozenset(ct.lower() for ct in (call_types or []))
+
+
+def compile_tariff_plan(config: Files) -> TariffPlan:
+    """
+    Compile a Files config into an immutable TariffPlan.
+
+    Args:
+        config (Files): Configuration object with client, carrier, and rates.
+
+    Returns:
+        TariffPlan: Plan that can be shared by every row and chunk of a file.
+    """
+    number_rates = []
+    for number, rate, rate_type, call_types in (
+        (config.number1, config.number1_rate, config.number1_rate_type, config.number1_chargeable_call_types),
+        (config.number2, config.number2_rate, config.number2_rate_type, config.number2_chargeable_call_types),
+    ):
+        number_rates.append(NumberRate(
+            number=number,
+            call_types=_lowered(call_types),
+            rate=rate or FALLBACK_RATE,
+            rate_type=_rate_type(rate_type, "per_minute"),
+        ))
+
+    return TariffPlan(
+        client=config.client,
+        carrier=config.carrier,
+        zero_charge_callers=SPECIAL_ZERO_CHARGE_CALLERS if config.client == ZERO_CHARGE_CLIENT else frozenset(),
+        chargeable_call_types=_lowered(config.chargeable_call_types) or DEFAULT_CHARGEABLE_CALL_TYPES,
+        general_call_types=_lowered(config.chargeable_call_types),
+        rate=0 if config.rate is None else config.rate,
+        rate_type=_rate_type(config.rate_type),
+        s2c_numbers=frozenset(config.s2c if isinstance(config.s2c, list) else [config.s2c]),
+        s2c_rate=0 if config.s2c_rate is None else config.s2c_rate,
+        s2c_rate_type=_rate_type(config.s2c_rate_type),
+        number_rates=tuple(number_rates),
+        # International call handling (always Indosat rates)
+        international_rates=MappingProxyType(INTERNATIONAL_RATE_INDEX["Indosat"]),
+    )
@@ -0,0 +1,219 @@
+"""
+The calculate_call_charge precedence chain as an ordered decision table.
+
+Each ChargeRule looks at whole columns and returns the rows it applies to
+together with their rate. Rules are evaluated in CHARGE_RULES order and a
+row belongs to the first rule that claims it, so rating a file costs one
+mask pass per rule. TariffPlan.resolve_rate is the same chain for one call.
+"""
+from dataclasses import dataclass, replace
+from typing import Callable, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.CallTable import CallTable, decode_numbers
+from src.charges import compute_charges, to_fixed
+from src.TariffPlan import (
+    FALLBACK_RATE,
+    PREMIUM_NUMBER_TYPES,
+    PREMIUM_RATE,
+    RATE_TYPES,
+    S2C_CALL_TYPES,
+    TariffPlan,
+)
+
+
+@dataclass
+class RatingColumns:
+    """The parsed columns the rules compare, prepared once per file or chunk."""
+    call_from: pd.Series    # stripped number text, "" for a parsed 0
+    call_to: pd.Series
+    call_type: pd.Series    # stripped, lowercased
+    number_type: pd.Series  # lowercased, "" when missing
+
+    def __len__(self) -> int:
+        return len(self.call_type)
+
+    @classmethod
+    def from_parsed(
+        cls,
+        number_type: np.ndarray,
+        call_type: pd.Series,
+        call_from: pd.Series,
+        from_is_int: np.ndarray,
+        call_to: pd.Series,
+        to_is_int: np.ndarray,
+    ) -> "RatingColumns":
+        # Comparisons use str(number or "").strip(), so a parsed 0 becomes ""
+        return cls(
+            call_from=call_from.str.strip().where(~(from_is_int & (call_from == "0")), ""),
+            call_to=call_to.str.strip().where(~(to_is_int & (call_to == "0")), ""),
+            call_type=call_type.str.strip().str.lower(),
+            number_type=pd.Series(number_type, index=call_type.index).fillna("").astype(str).str.lower(),
+        )
+
+
+class Claim(NamedTuple):
+    mask: np.ndarray
+    rate: float | np.ndarray
+    rate_type: Optional[str]
+    # Where the scalar path prints the charge as a float; None: from the rate's type
+    as_float: Optional[bool | np.ndarray] = None
+
+
+@dataclass(frozen=True)
+class ChargeRule:
+    name: str
+    claim: Callable[[TariffPlan, RatingColumns], Claim]
+
+
+def _zero_charge_caller(plan: TariffPlan, cols: RatingColumns) -> Claim:
+    return Claim(cols.call_from.isin(plan.zero_charge_callers), 0, "per_minute")
+
+
+def _internal(plan: TariffPlan, cols: RatingColumns) -> Claim:
+    return Claim(cols.number_type == "internal call", 0, "per_minute")
+
+
+def _premium(plan: TariffPlan, cols: RatingColumns) -> Claim:
+    return Claim(cols.number_type.isin(PREMIUM_NUMBER_TYPES), PREMIUM_RATE, "per_minute")
+
+
+def _international(plan: TariffPlan, cols: RatingColumns) -> Claim:
+    codes, uniques = pd.factorize(cols.number_type)
+    rates = [plan.international_rate(u) for u in uniques]
+    return Claim(
+        np.array([bool(r) for r in rates], dtype=bool)[codes],
+        np.array([r or 0 for r in rates], dtype=np.float64)[codes],
+        "per_minute",
+        as_float=np.array([isinstance(r, float) for r in rates], dtype=bool)[codes],
+    )
+
+
+def _s2c(plan: TariffPlan, cols: RatingColumns) -> Claim:
+    target = cols.call_to.where(cols.call_to != "", cols.call_from)
+    mask = (target.isin(plan.s2c_numbers) | (cols.number_type == "scancall")) & (
+        cols.call_type.isin(S2C_CALL_TYPES) | cols.call_type.isin(plan.chargeable_call_types)
+    )
+    return Claim(mask, plan.s2c_rate, plan.s2c_rate_type)
+
+
+def _special_number(index: int) -> Callable[[TariffPlan, RatingColumns], Claim]:
+    def claim(plan: TariffPlan, cols: RatingColumns) -> Claim:
+        special = plan.number_rates[index]
+        mask = cols.call_type.isin(special.call_types) & (
+            (cols.call_to == special.number) | (cols.call_from == special.number)
+        )
+        return Claim(mask, special.rate, special.rate_type)
+    return claim
+
+
+def _general(plan: TariffPlan, cols: RatingColumns) -> Claim:
+    if plan.general_call_types:
+        mask = cols.call_type.isin(plan.general_call_types)
+    else:
+        mask = np.ones(len(cols), dtype=bool)
+    return Claim(mask, plan.rate, plan.rate_type)
+
+
+def _excluded_call_type(plan: TariffPlan, cols: RatingColumns) -> Claim:
+    return Claim(~cols.call_type.isin(plan.chargeable_call_types), 0, "per_minute")
+
+
+def _fallback(plan: TariffPlan, cols: RatingColumns) -> Claim:
+    return Claim(np.ones(len(cols), dtype=bool), FALLBACK_RATE, "per_minute")
+
+
+CHARGE_RULES: tuple[ChargeRule, ...] = (
+    ChargeRule("zero-charge caller", _zero_charge_caller),
+    ChargeRule("internal call", _internal),
+    ChargeRule("premium / toll-free / emergency", _premium),
+    ChargeRule("international", _international),
+    ChargeRule("s2c", _s2c),
+    ChargeRule("number 1", _special_number(0)),
+    ChargeRule("number 2", _special_number(1)),
+    ChargeRule("general rate", _general),
+    ChargeRule("excluded call type", _excluded_call_type),
+    ChargeRule("fallback", _fallback),
+)
+
+
+@dataclass
+class RateDecisions:
+    """Per-row outcome of evaluating the rules."""
+    rule: np.ndarray        # index into the rule table, -1 if unclaimed
+    rate: np.ndarray        # int64 fixed point (see src.charges)
+    per_second: np.ndarray
+    as_float: np.ndarray
+
+    def charges(self, seconds: np.ndarray) -> np.ndarray:
+        """Fixed-point charge per row."""
+        return compute_charges(seconds, self.rate, self.per_second)
+
+
+def evaluate_charge_rules(
+    plan: TariffPlan, cols: RatingColumns, rules: tuple[ChargeRule, ...] = CHARGE_RULES
+) -> RateDecisions:
+    """
+    Resolve the rate of every row: each rule claims the rows no earlier
+    rule has claimed. A rule whose rate type is unknown claims nothing.
+    """
+    size = len(cols)
+    decisions = RateDecisions(
+        rule=np.full(size, -1, dtype=np.int8),
+        rate=np.zeros(size, dtype=np.int64),
+        per_second=np.zeros(size, dtype=bool),
+        as_float=np.zeros(size, dtype=bool),
+    )
+    unclaimed = np.ones(size, dtype=bool)
+    for i, rule in enumerate(rules):
+        if not unclaimed.any():
+            break
+        claim = rule.claim(plan, cols)
+        if claim.rate_type not in RATE_TYPES:
+            continue
+        mask = np.asarray(claim.mask, dtype=bool) & unclaimed
+        per_second = claim.rate_type == "per_second"
+        rate = to_fixed(claim.rate)
+        as_float = isinstance(claim.rate, float) if claim.as_float is None else claim.as_float
+        as_float = np.asarray(as_float, dtype=bool) | per_second
+
+        decisions.rule[mask] = i
+        decisions.rate[mask] = rate[mask] if rate.ndim else rate
+        decisions.per_second[mask] = per_second
+        decisions.as_float[mask] = as_float[mask] if as_float.ndim else as_float
+        unclaimed &= ~mask
+    return decisions
+
+
+def table_rating_columns(table: CallTable) -> RatingColumns:
+    """RatingColumns for calls already held in a CallTable."""
+    call_from = pd.Series(decode_numbers(table.call_from, table.number_texts), dtype=object)
+    call_to = pd.Series(decode_numbers(table.call_to, table.number_texts), dtype=object)
+    # Only integers are stored as non-negative codes, and a parsed "0" is always one
+    return RatingColumns.from_parsed(
+        np.asarray(table.number_type, dtype=object),
+        pd.Series(np.asarray(table.call_type, dtype=object), dtype=object),
+        call_from,
+        table.call_from >= 0,
+        call_to,
+        table.call_to >= 0,
+    )
+
+
+def rerate_table(table: CallTable, plan: TariffPlan, cols: Optional[RatingColumns] = None) -> CallTable:
+    """
+    Return a copy of table rated against plan. Only the charge columns change.
+
+    Args:
+        cols (Optional[RatingColumns]): From table_rating_columns, to share between plans.
+    """
+    decisions = evaluate_charge_rules(plan, cols if cols is not None else table_rating_columns(table))
+    return replace(
+        table,
+        call_charge=decisions.charges(table.call_duration),
+        call_rate=decisions.rate,
+        per_second=decisions.per_second,
+        charge_as_float=decisions.as_float,
+    )
@@ -0,0 +1,64 @@
+"""
+Call charges in integer fixed point.
+
+Charges are int64 counts of 1/CHARGE_SCALE rupiah, so totals over a whole
+file are exact and never need the charge text re-parsed. Rates are
+converted once, rounded to CHARGE_SCALE; the form takes rates with two
+decimals, so every rate it produces is exact. The CSV text is still
+formatted the way the scalar path prints it (see format_charges).
+"""
+import numpy as np
+
+# Fixed-point units per rupiah
+CHARGE_SCALE = 10_000
+
+
+def to_fixed(rates) -> np.ndarray:
+    """Convert rupiah rates (scalar or array) to int64 fixed-point units."""
+    return np.rint(np.asarray(rates, dtype=np.float64) * CHARGE_SCALE).astype(np.int64)
+
+
+def from_fixed(units: np.ndarray) -> np.ndarray:
+    """Convert fixed-point units back to float64 rupiah."""
+    return np.asarray(units, dtype=np.int64) / CHARGE_SCALE
+
+
+def billed_units(seconds: np.ndarray, per_second: np.ndarray) -> np.ndarray:
+    """
+    Units each call is billed for: every second for per-second rates,
+    started minutes (ceil of seconds / 60) otherwise.
+    """
+    seconds = np.asarray(seconds, dtype=np.int64)
+    return np.where(per_second, seconds, -(-seconds // 60))
+
+
+def compute_charges(seconds: np.ndarray, rates: np.ndarray, per_second: np.ndarray) -> np.ndarray:
+    """
+    Charge every call at its resolved rate, like calculate_per_minute_charge
+    and calculate_per_second_charge.
+
+    Args:
+        seconds (np.ndarray): Call durations in whole seconds.
+        rates (np.ndarray): int64 fixed-point rate per call (see to_fixed).
+        per_second (np.ndarray): True where the rate is per second.
+
+    Returns:
+        np.ndarray: int64 fixed-point charge per call.
+    """
+    return billed_units(seconds, per_second) * np.asarray(rates, dtype=np.int64)
+
+
+def format_charges(
+    seconds: np.ndarray, rates: np.ndarray, per_second: np.ndarray, as_float: np.ndarray
+) -> np.ndarray:
+    """
+    Format charges exactly as the CallDetail path prints them.
+
+    Integer rates print whole rupiah ("1440"). Where the scalar path
+    multiplied floats the text is that float product ("1440.0",
+    "44649.299999999996"), which the same float64 multiplication reproduces.
+    """
+    billed = billed_units(seconds, per_second)
+    whole = (billed * np.asarray(rates, dtype=np.int64) // CHARGE_SCALE).astype(str)
+    product = (billed.astype(np.float64) * from_fixed(rates)).astype(str)
+    return np.where(as_float, product, whole).astype(object)
@@ -0,0 +1,427 @@
+"""
+Columnar processing of MiiTel dashboard exports.
+
+Works on whole pandas/NumPy columns instead of building one CallDetail per
+row. The CallDetail path stays the reference implementation: for the same
+input, process_dashboard_frame must produce the same rows and columns as
+save_merged_csv writes.
+"""
+from dataclasses import dataclass, fields
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.CallTable import MAX_INT64_DIGITS, OUTPUT_COLUMNS, CallTable
+from src.charge_rules import RatingColumns, evaluate_charge_rules
+from src.dedup import DedupIndex
+from src.FileConfig import Files
+from src.idn_area_codes import EMERGENCY_NUMBERS
+from src.TariffPlan import TariffPlan, compile_tariff_plan
+from src.utils import classify_prefix
+
+_EMERGENCY_BY_STR = {str(k): v for k, v in EMERGENCY_NUMBERS.items()}
+_DURATION_PATTERN = r"^\s*(?:(\d+):(\d+):(\d+)|(\d+))\s*$"
+
+# Columns of the MiiTel dashboard export that processing reads, with how to load them
+DASHBOARD_DTYPES = {
+    "Sequence ID": "string",
+    "User name": "category",
+    "Call from": "string",
+    "Call to": "string",
+    "Call type": "category",
+    "Call memo": "string",
+}
+DASHBOARD_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+DASHBOARD_DATETIME_COLUMNS = ["Dial begin time", "Call begin time", "Call end time"]
+DASHBOARD_DURATION_COLUMNS = ["Ringing time", "Call duration"]
+DASHBOARD_COLUMNS = [*DASHBOARD_DTYPES, *DASHBOARD_DATETIME_COLUMNS, *DASHBOARD_DURATION_COLUMNS]
+
+
+def apply_dashboard_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert timestamp columns to datetime64 (NaT for "-") and durations to
+    integer seconds, in place. Other columns keep the dtypes read_csv gave them.
+    """
+    for name in DASHBOARD_DATETIME_COLUMNS:
+        if name in df.columns:
+            df[name] = _datetimes(df, name)
+    for name in DASHBOARD_DURATION_COLUMNS:
+        if name in df.columns:
+            df[name] = _seconds(df, name)
+    return df
+
+
+def _column(df: pd.DataFrame, name: str, missing: str = "") -> pd.Series:
+    """Return a dashboard column as strings, "" for empty cells and `missing` when the column is absent."""
+    if name not in df.columns:
+        return pd.Series([missing] * len(df), index=df.index, dtype=object)
+    return df[name].astype(object).where(df[name].notna(), "").astype(str)
+
+
+def _datetimes(df: pd.DataFrame, name: str) -> pd.Series:
+    if name in df.columns and pd.api.types.is_datetime64_any_dtype(df[name]):
+        return df[name]
+    if name not in df.columns:
+        return pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    return parse_datetimes(df[name])
+
+
+def parse_datetimes(values, format: str = DASHBOARD_DATETIME_FORMAT) -> pd.Series:
+    """
+    Parse a column of timestamps into datetime64[ns] in one pass.
+
+    Values are parsed with the fixed dashboard format; "-", empty and missing
+    values become NaT. Anything else the format does not match (a "T"
+    separator, fractions, a UTC offset) is parsed as ISO 8601 and kept as its
+    wall-clock time, like the CallDetail path prints it.
+
+    Raises:
+        ValueError: If a value is neither in the format nor ISO 8601.
+    """
+    values = pd.Series(values)
+    text = values.astype("string")
+    missing = text.isna() | text.str.strip().isin(["-", ""])
+    text = text.mask(missing)
+    parsed = pd.to_datetime(text, format=format, errors="coerce")
+    retry = parsed.isna() & ~missing
+    if retry.any():
+        # Rare, and may mix offsets, so parsed one value at a time
+        parsed[retry] = [pd.Timestamp(value).tz_localize(None) for value in text[retry]]
+    return parsed.astype("datetime64[ns]")
+
+
+def _seconds(df: pd.DataFrame, name: str) -> np.ndarray:
+    if name in df.columns and pd.api.types.is_integer_dtype(df[name]):
+        return df[name].to_numpy(dtype=np.int64)
+    seconds, malformed = parse_durations(_column(df, name))
+    if malformed.any():
+        examples = ", ".join(repr(v) for v in _column(df, name)[malformed].unique()[:5])
+        raise ValueError(f"{name}: {int(malformed.sum())} malformed durations ({examples})")
+    return seconds
+
+
+def _int_or_none(value: str) -> Optional[str]:
+    try:
+        return str(int(value))
+    except ValueError:
+        return None
+
+
+def normalise_phone_numbers(values) -> tuple[np.ndarray, np.ndarray, pd.Series]:
+    """
+    Column version of parse_phone_number.
+
+    Strips "+", "-", "(", ")" and spaces, removes a leading "62" and converts
+    what is left to an integer where int() would. Each distinct value is
+    parsed once.
+
+    Args:
+        values: Sequence, Series or array of raw numbers. Missing values are
+            treated as "".
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, pd.Series]: int64 numbers (0 where
+        non-numeric, or too long for an int64), a mask of non-numeric values
+        such as "scancall", and the text form of each parsed number, i.e.
+        str(parse_phone_number(value)).
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_integer_dtype(values):
+        numbers = values.to_numpy(dtype=np.int64)
+        return numbers, np.zeros(len(values), dtype=bool), values.astype(str).astype(object)
+
+    codes, uniques = pd.factorize(values.astype(object))
+    raw = pd.Series(uniques, dtype=object).astype(str)
+    cleaned = raw.str.replace(r"[+\-() ]", "", regex=True).str.replace(r"^62", "", regex=True)
+    digits = cleaned.str.fullmatch(r"\s*[0-9]+\s*")
+    stripped = cleaned[digits].str.strip().str.lstrip("0")
+    text = cleaned.astype(object)
+    text[digits] = stripped.where(stripped != "", "0")
+    is_int = digits.to_numpy(dtype=bool).copy()
+
+    # Anything int() may still accept (underscores, non-ASCII digits)
+    maybe_int = ~digits & cleaned.str.contains(r"\d")
+    for i in np.flatnonzero(maybe_int.to_numpy(dtype=bool)):
+        parsed = _int_or_none(cleaned.iat[i])
+        if parsed is not None:
+            text.iat[i] = parsed
+            is_int[i] = True
+
+    fits = is_int & (text.str.len() <= MAX_INT64_DIGITS).to_numpy()
+    unique_numbers = np.zeros(len(text), dtype=np.int64)
+    unique_numbers[fits] = text[fits].astype("int64").to_numpy()
+
+    # Missing values (code -1) read as "", which is non-numeric
+    text = pd.concat([text, pd.Series([""], dtype=object)], ignore_index=True)
+    unique_numbers = np.append(unique_numbers, 0)
+    is_int = np.append(is_int, False)
+    return (
+        unique_numbers[codes],
+        ~is_int[codes],
+        pd.Series(text.to_numpy()[codes], index=values.index, dtype=object),
+    )
+
+
+def parse_durations(values) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Parse a column of durations into integer seconds in one pass.
+
+    Accepts "H:MM:SS" strings and raw seconds (as text or numbers). Each
+    distinct value is parsed once, so repeated durations cost nothing extra.
+
+    Args:
+        values: Sequence, Series or array of durations.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: int64 seconds (0 where malformed) and a
+        boolean mask of the values that could not be parsed.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        numbers = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        malformed = ~np.isfinite(numbers) | (numbers < 0) | (numbers != np.floor(numbers))
+        return np.where(malformed, 0, numbers).astype(np.int64), malformed
+
+    codes, uniques = pd.factorize(values.astype(object))
+    parts = pd.Series(uniques, dtype=object).astype(str).str.extract(_DURATION_PATTERN)
+    unique_malformed = parts.isna().all(axis=1).to_numpy()
+    h, m, s, raw = (parts[i].fillna("0").astype("int64").to_numpy() for i in range(4))
+    unique_seconds = h * 3600 + m * 60 + s + raw
+
+    # Missing values (NaN/None) get code -1
+    missing = codes < 0
+    seconds = unique_seconds[codes]
+    malformed = unique_malformed[codes]
+    seconds[missing] = 0
+    malformed[missing] = True
+    seconds[malformed] = 0
+    return seconds, malformed
+
+
+def _classify(
+    call_type: pd.Series,
+    call_from: pd.Series,
+    from_is_int: np.ndarray,
+    call_to: pd.Series,
+    to_is_int: np.ndarray,
+) -> np.ndarray:
+    """Column version of classify_number."""
+    codes, uniques = pd.factorize(call_to)
+    by_prefix = np.array([classify_prefix(u) for u in uniques], dtype=object)[codes]
+
+    emergency = call_to.map(_EMERGENCY_BY_STR)
+    is_emergency = (
+        to_is_int
+        & call_to.str.len().isin([3, 4, 5]).to_numpy()
+        & emergency.notna().to_numpy()
+    )
+    from_text = call_from.astype(str)
+    three_digit_from = (from_text.str.len() == 3) & from_text.str.isdigit()
+
+    conditions = [
+        call_type.isin(["Internal Call", "EXTENSION"]).to_numpy(),
+        (call_type == "Internal Call (No answer)").to_numpy(),
+        (call_type == "AUTOMATIC_RECORD").to_numpy(),
+        (call_type == "AUTOMATIC_TRANSFER").to_numpy(),
+        (call_type == "Monitoring").to_numpy(),
+        ((call_from == "scancall") & ~from_is_int).to_numpy(),
+        ((call_type == "Call transfer") & three_digit_from).to_numpy(),
+        is_emergency,
+    ]
+    choices = [
+        "Internal Call",
+        "Internal Call (No answer)",
+        "Voicemail",
+        "Automatic Transfer",
+        "Monitoring",
+        "scancall",
+        "Internal Call",
+        emergency.to_numpy(dtype=object),
+    ]
+    return np.select(conditions, choices, default=by_prefix)
+
+
+@dataclass
+class RatedRows:
+    """
+    Parsed, classified and rated dashboard rows, before deduplication.
+
+    Rows of several chunks can be concatenated and deduplicated together,
+    which gives the same calls as processing the whole file at once.
+    """
+    sequence_id: np.ndarray
+    user_name: np.ndarray   # raw, "" when empty
+    call_memo: np.ndarray   # raw, "" when empty
+    call_from: pd.Series
+    from_is_int: np.ndarray
+    from_number: np.ndarray  # int64, see normalise_phone_numbers
+    call_to: pd.Series
+    to_is_int: np.ndarray
+    to_number: np.ndarray
+    call_type: pd.Series
+    number_type: np.ndarray
+    dial_start_at: pd.Series
+    dial_answered_at: pd.Series
+    dial_end_at: pd.Series
+    ringing_time: np.ndarray
+    call_duration: np.ndarray
+    call_charge: np.ndarray
+    call_rate: np.ndarray
+    per_second: np.ndarray
+    charge_as_float: np.ndarray
+    packed: np.ndarray      # DedupIndex keys
+
+    def __len__(self) -> int:
+        return len(self.call_duration)
+
+    @classmethod
+    def concat(cls, parts: list["RatedRows"]) -> "RatedRows":
+        values = {}
+        for f in fields(cls):
+            items = [getattr(part, f.name) for part in parts]
+            if isinstance(items[0], pd.Series):
+                values[f.name] = pd.concat(items, ignore_index=True)
+            else:
+                values[f.name] = np.concatenate(items)
+        return cls(**values)
+
+
+def rate_rows(df: pd.DataFrame, plan: TariffPlan, index: DedupIndex) -> RatedRows:
+    """
+    Parse, classify and rate every row of a dashboard export (or chunk).
+
+    Args:
+        df (pd.DataFrame): Dashboard export as read by read_dashboard_csv (or
+            all-string columns as read by process_dashboard_csv).
+        plan (TariffPlan): Compiled tariffs.
+        index (DedupIndex): Packs the dedup keys; use one index for all chunks of a file.
+    """
+    df = df.reset_index(drop=True)
+    call_type = _column(df, "Call type")
+    from_number, from_text_only, call_from = normalise_phone_numbers(_column(df, "Call from"))
+    to_number, to_text_only, call_to = normalise_phone_numbers(_column(df, "Call to"))
+    from_is_int, to_is_int = ~from_text_only, ~to_text_only
+
+    dial_start = _datetimes(df, "Dial begin time")
+    duration = _seconds(df, "Call duration")
+
+    number_type = _classify(call_type, call_from, from_is_int, call_to, to_is_int)
+    rating = RatingColumns.from_parsed(number_type, call_type, call_from, from_is_int, call_to, to_is_int)
+    rules = evaluate_charge_rules(plan, rating)
+
+    return RatedRows(
+        sequence_id=_column(df, "Sequence ID").to_numpy(dtype=object),
+        # Without the column, CallDetail formats the "" default as "-"
+        user_name=_column(df, "User name", missing="-").to_numpy(dtype=object),
+        call_memo=_column(df, "Call memo", missing="-").to_numpy(dtype=object),
+        call_from=call_from,
+        from_is_int=from_is_int,
+        from_number=from_number,
+        call_to=call_to,
+        to_is_int=to_is_int,
+        to_number=to_number,
+        call_type=call_type,
+        number_type=np.asarray(number_type, dtype=object),
+        dial_start_at=dial_start,
+        dial_answered_at=_datetimes(df, "Call begin time"),
+        dial_end_at=_datetimes(df, "Call end time"),
+        ringing_time=_seconds(df, "Ringing time"),
+        call_duration=duration,
+        call_charge=rules.charges(duration),
+        call_rate=rules.rate,
+        per_second=rules.per_second,
+        charge_as_float=rules.as_float,
+        packed=index.pack(call_from, from_is_int, call_to, to_is_int, dial_start, from_number, to_number),
+    )
+
+
+def first_occurrences(packed: np.ndarray) -> np.ndarray:
+    """True for the first row of every distinct dedup key."""
+    return ~pd.DataFrame(packed, columns=["from", "to", "start"]).duplicated(keep="first").to_numpy()
+
+
+def dedup_rows(rows: RatedRows, seen: Optional[DedupIndex] = None) -> CallTable:
+    """
+    Keep the first call per key; later duplicates only refresh user name and memo.
+
+    Args:
+        rows (RatedRows): Rated rows, e.g. from rate_rows.
+        seen (Optional[DedupIndex]): Calls already emitted by earlier chunks.
+            Rows matching one of them are dropped, and the new calls are added.
+    """
+    keys = pd.DataFrame(rows.packed, columns=["from", "to", "start"])
+    first = ~keys.duplicated(keep="first").to_numpy()
+    last = ~keys.duplicated(keep="last").to_numpy()
+    group = keys.groupby(["from", "to", "start"], sort=False).ngroup().to_numpy()
+    repeated = np.bincount(group)[group] > 1
+    last_row = np.empty(group.max() + 1 if len(group) else 0, dtype=np.int64)
+    last_row[group[last]] = np.flatnonzero(last)
+    source = np.where(repeated, last_row[group], np.arange(len(group)))
+
+    # Empty user names and memos stay blank, as save_merged_csv writes them
+    user_name = rows.user_name[source]
+    memo = rows.call_memo[source]
+
+    if seen is not None:
+        first[first] = seen.add(rows.packed[first])
+
+    return CallTable.from_columns(
+        sequence_id=rows.sequence_id[first],
+        user_name=user_name[first],
+        call_from=rows.call_from[first],
+        from_is_int=rows.from_is_int[first],
+        call_to=rows.call_to[first],
+        to_is_int=rows.to_is_int[first],
+        call_type=rows.call_type[first],
+        number_type=rows.number_type[first],
+        dial_start_at=rows.dial_start_at[first],
+        dial_answered_at=rows.dial_answered_at[first],
+        dial_end_at=rows.dial_end_at[first],
+        ringing_time=rows.ringing_time[first],
+        call_duration=rows.call_duration[first],
+        call_memo=memo[first],
+        call_charge=rows.call_charge[first],
+        call_rate=rows.call_rate[first],
+        per_second=rows.per_second[first],
+        charge_as_float=rows.charge_as_float[first],
+        from_number=rows.from_number[first],
+        to_number=rows.to_number[first],
+    )
+
+
+def build_call_table(
+    df: pd.DataFrame,
+    config: Files,
+    seen: Optional[DedupIndex] = None,
+    plan: Optional[TariffPlan] = None,
+) -> CallTable:
+    """
+    Process a dashboard export held in a DataFrame, one column at a time.
+
+    Args:
+        df (pd.DataFrame): Dashboard export as read by read_dashboard_csv (or
+            all-string columns as read by process_dashboard_csv).
+        config (Files): Configuration object with client, carrier, and rates.
+        seen (Optional[DedupIndex]): Calls already emitted by earlier chunks.
+            Rows matching one of them are dropped, and the new calls are added.
+        plan (Optional[TariffPlan]): Compiled tariffs for config, compiled here if omitted.
+
+    Returns:
+        CallTable: Deduplicated, rated calls.
+    """
+    index = seen if seen is not None else DedupIndex()
+    rows = rate_rows(df, plan or compile_tariff_plan(config), index)
+    return dedup_rows(rows, seen)
+
+
+def process_dashboard_frame(
+    df: pd.DataFrame,
+    config: Files,
+    seen: Optional[DedupIndex] = None,
+    plan: Optional[TariffPlan] = None,
+) -> pd.DataFrame:
+    """
+    Same as build_call_table, formatted with the columns save_merged_csv writes.
+    """
+    return build_call_table(df, config, seen=seen, plan=plan).to_frame()
@@ -1,8 +1,37 @@
-from typing import Optional
+import csv
+import io
+import os
+import tempfile
+from dataclasses import dataclass, replace
+from typing import BinaryIO, Callable, Optional
+import numpy as np
 import pandas as pd
 import math
 from src.CallDetail import CallDetail
 from src.FileConfig import Files
+from src.columnar import (
+    DASHBOARD_COLUMNS,
+    DASHBOARD_DTYPES,
+    OUTPUT_COLUMNS,
+    RatedRows,
+    apply_dashboard_schema,
+    build_call_table,
+    dedup_rows,
+    first_occurrences,
+    parse_datetimes,
+    parse_durations,
+    process_dashboard_frame,
+    rate_rows,
+)
+from src.CallTable import CallTable
+from src.charge_rules import RatingColumns, evaluate_charge_rules
+from src.charges import format_charges, from_fixed
+from src.dedup import DedupIndex
+from src.TariffPlan import TariffPlan, compile_tariff_plan
+from src.utils import classification_cache_stats, format_cache_stats, parse_call_memo
+
+DEFAULT_CHUNKSIZE = 50_000
+WRITE_SLICE_ROWS = 100_000
 
 
 def process_dashboard_csv(
@@ -24,10 +53,10 @@ def process_dashboard_csv(
 
     print(f"- Reading dashboard file {config.dashboard}...")
     df = pd.read_csv(config.dashboard, low_memory=False).astype(str)
+    plan = compile_tariff_plan(config)
 
     for _, row in df.iterrows():
         call_detail = CallDetail(
-            client=config.client,
             sequence_id=row.get("Sequence ID", ""),
             user_name=row.get("User name", ""),
             call_from=row.get("Call from", ""),
@@ -39,8 +68,8 @@ def process_dashboard_csv(
             ringing_time=row.get("Ringing time", ""),
             call_duration=row.get("Call duration", ""),
             call_memo=row.get("Call memo", ""),
-            carrier=config.carrier,  # always Indosat
-            config=config,           # pass form config to CallDetail
+            config=config,  # client, carrier and rates come from the config
+            plan=plan,
         )
 
         key = call_detail.hash_key()
@@ -48,13 +77,260 @@ def process_dashboard_csv(
             # Update existing entry if already present
             existing = call_details[key]
             existing.user_name = row.get("User name", "")
-            existing.call_memo = row.get("Call memo", "")
+            existing.call_memo = parse_call_memo(row.get("Call memo", ""))
         else:
             call_details[key] = call_detail
 
+    print(f"- Classification caches so far: {format_cache_stats(classification_cache_stats())}")
     return call_details
 
 
+def read_dashboard_csv(source, chunksize: Optional[int] = None):
+    """
+    Read a MiiTel dashboard export with an explicit column schema.
+
+    Only the columns processing uses are loaded: numbers, IDs and memos as
+    strings, call type and user name as categoricals, the three timestamps as
+    datetimes (NaT for "-") and both durations as integer seconds.
+
+    Args:
+        source: Path or file-like object of the export.
+        chunksize (Optional[int]): Rows per chunk; when set, yields DataFrames.
+
+    Returns:
+        pd.DataFrame, or an iterator of DataFrames when chunksize is set.
+    """
+    reader = pd.read_csv(
+        source,
+        usecols=lambda column: column in DASHBOARD_COLUMNS,
+        dtype=DASHBOARD_DTYPES,
+        chunksize=chunksize,
+    )
+    if chunksize is None:
+        return apply_dashboard_schema(reader)
+    return (apply_dashboard_schema(chunk) for chunk in reader)
+
+
+def process_dashboard_table(config: Files) -> CallTable:
+    """
+    Process a dashboard CSV file column by column into a CallTable.
+
+    Args:
+        config (Files): Configuration object with client, dashboard path, carrier, and rates.
+
+    Returns:
+        CallTable: Processed, deduplicated calls.
+    """
+    print(f"- Reading dashboard file {config.dashboard}...")
+    return build_call_table(read_dashboard_csv(config.dashboard), config)
+
+
+def process_dashboard_columnar(config: Files) -> pd.DataFrame:
+    """
+    Process a dashboard CSV file column by column instead of row by row.
+
+    Produces the same rows and columns as process_dashboard_csv followed by
+    save_merged_csv, without building a CallDetail per row.
+
+    Args:
+        config (Files): Configuration object with client, dashboard path, carrier, and rates.
+
+    Returns:
+        pd.DataFrame: Processed, deduplicated calls ready to be saved.
+    """
+    return process_dashboard_table(config).to_frame()
+
+
+@dataclass
+class ProgressEvent:
+    """Running totals of a chunked run. Calls are counted once, at their first row."""
+    rows: int
+    total_rows: Optional[int]
+    chunks: int
+    calls: int
+    minutes: int    # started minutes of charged calls
+    charge: float
+    done: bool = False
+
+    @property
+    def fraction(self) -> float:
+        """Share of rows processed, estimated when the row count is."""
+        if self.done:
+            return 1.0
+        if not self.total_rows:
+            return 0.0
+        return min(self.rows / self.total_rows, 0.99)
+
+
+def estimate_rows(data: bytes) -> int:
+    """Rows in a CSV held in memory, from its line count (exact unless values contain newlines)."""
+    return max(data.count(b"\n") - 1 + (not data.endswith(b"\n")), 0)
+
+
+def process_dashboard_chunks(
+    source,
+    plan: TariffPlan,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    total_rows: Optional[int] = None,
+    on_progress: Optional[Callable[[ProgressEvent], None]] = None,
+) -> CallTable:
+    """
+    Process a dashboard export chunk by chunk, reporting progress after each.
+
+    Rows are parsed, classified and rated per chunk, then deduplicated
+    together at the end, so the result is the same as for the whole file at
+    once (unlike stream_dashboard_csv, duplicates in later chunks still
+    refresh user name and memo). Memory grows with the file.
+
+    Args:
+        source: Path or file-like object of the export.
+        plan (TariffPlan): Compiled tariffs.
+        chunksize (int): Number of dashboard rows per chunk.
+        total_rows (Optional[int]): Expected row count, for ProgressEvent.fraction.
+        on_progress (Optional[Callable[[ProgressEvent], None]]): Called after
+            every chunk and once more when done.
+
+    Returns:
+        CallTable: Deduplicated, rated calls.
+    """
+    index = DedupIndex()
+    parts = []
+    progress = ProgressEvent(rows=0, total_rows=total_rows, chunks=0, calls=0, minutes=0, charge=0.0)
+    charge_units = 0
+    for chunk in read_dashboard_csv(source, chunksize=chunksize):
+        rows = rate_rows(chunk, plan, index)
+        parts.append(rows)
+
+        first = first_occurrences(rows.packed)
+        new = np.zeros(len(rows), dtype=bool)
+        new[first] = index.add(rows.packed[first])
+        charged = new & (rows.call_charge > 0)
+        charge_units += int(rows.call_charge[new].sum())
+        progress = replace(
+            progress,
+            rows=progress.rows + len(rows),
+            chunks=progress.chunks + 1,
+            calls=progress.calls + int(new.sum()),
+            minutes=progress.minutes + int((-(-rows.call_duration[charged] // 60)).sum()),
+            charge=float(from_fixed(charge_units)),
+        )
+        if on_progress:
+            on_progress(progress)
+
+    table = dedup_rows(RatedRows.concat(parts)) if parts else build_call_table(pd.DataFrame(), None, plan=plan)
+    if on_progress:
+        on_progress(replace(progress, done=True))
+    return table
+
+
+def stream_dashboard_csv(
+    config: Files,
+    output_path: str,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> int:
+    """
+    Process a dashboard CSV file in chunks, appending each chunk to the output.
+
+    Peak memory depends on the chunk size rather than the file size; only a
+    compact DedupIndex of calls already written is kept between chunks. A duplicate that
+    lands in a later chunk is dropped, but cannot refresh the user name and
+    memo of a row that was already written.
+
+    Args:
+        config (Files): Configuration object with client, dashboard path, carrier, and rates.
+        output_path (str): CSV file to write the processed calls to.
+        chunksize (int): Number of dashboard rows to read per chunk.
+
+    Returns:
+        int: Number of calls written.
+    """
+    print(f"- Streaming dashboard file {config.dashboard} to {output_path}...")
+    plan = compile_tariff_plan(config)
+    seen = DedupIndex()
+    written = 0
+    for chunk in read_dashboard_csv(config.dashboard, chunksize=chunksize):
+        processed = process_dashboard_frame(chunk, config, seen=seen, plan=plan)
+        processed.to_csv(output_path, mode="a" if written else "w", header=not written, index=False)
+        written += len(processed)
+        print(f"- {written} calls written...")
+    return written
+
+
+def _read_processed_frame(source) -> pd.DataFrame:
+    """Processed CSV with every value kept as the exact text written."""
+    df = pd.read_csv(source, dtype=str, keep_default_na=False)
+    missing = [name for name in OUTPUT_COLUMNS if name not in df.columns]
+    if missing:
+        raise ValueError(f"Not a processed calls file, missing columns: {', '.join(missing)}")
+    return df
+
+
+def _processed_durations(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Ringing time and call duration in seconds. Processed durations drop
+    whole days; they are restored from the dial start and end times, which
+    span ringing time plus call duration.
+    """
+    durations = {}
+    for name in ("Ringing time", "Call duration"):
+        seconds, malformed = parse_durations(df[name])
+        if malformed.any():
+            raise ValueError(f"{name}: {int(malformed.sum())} malformed durations")
+        durations[name] = seconds
+
+    dial_start = parse_datetimes(df["Dial starts at"])
+    dial_end = parse_datetimes(df["Dial ends at"])
+    elapsed = ((dial_end - dial_start).dt.total_seconds().fillna(0)).to_numpy(dtype=np.int64)
+    dropped = elapsed - durations["Ringing time"] - durations["Call duration"]
+    days = np.maximum(np.rint(dropped / 86400), 0).astype(np.int64)
+    return durations["Ringing time"], durations["Call duration"] + days * 86400
+
+
+def _processed_numbers(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    # Only parsed integers are written as plain digits
+    return (
+        df["Call from"].str.fullmatch(r"[0-9]+").to_numpy(dtype=bool),
+        df["Call to"].str.fullmatch(r"[0-9]+").to_numpy(dtype=bool),
+    )
+
+
+def rerate_processed_csv(config: Files, source: Optional[str] = None, output_path: Optional[str] = None) -> int:
+    """
+    Recompute Call charge in a processed CSV under the current tariffs,
+    without the original dashboard export.
+
+    Args:
+        config (Files): Configuration with the tariffs to apply.
+        source (Optional[str]): Processed CSV to read, config.output by default.
+        output_path (Optional[str]): Where to write the result, the source by default.
+
+    Returns:
+        int: Number of calls re-rated.
+    """
+    source = source or config.output
+    output_path = output_path or source
+    print(f"- Re-rating processed file {source}...")
+    df = _read_processed_frame(source)
+    _, duration = _processed_durations(df)
+    from_is_int, to_is_int = _processed_numbers(df)
+    number_type = df["Number type"].where(df["Number type"] != "", None).to_numpy(dtype=object)
+    cols = RatingColumns.from_parsed(number_type, df["Call type"], df["Call from"], from_is_int, df["Call to"], to_is_int)
+    decisions = evaluate_charge_rules(compile_tariff_plan(config), cols)
+    # Every other column is written back exactly as it was read
+    df["Call charge"] = format_charges(duration, decisions.rate, decisions.per_second, decisions.as_float)
+    # The processed file may be the only copy left: write next to it and
+    # rename, so an interrupted run never leaves it half written
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_path)), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            df.to_csv(f, index=False, encoding="utf-8")
+        os.replace(tmp, output_path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return len(df)
+
+
 def round_up_duration_minutes(call_duration: str) -> int:
     """
     Round up call duration string to minutes.
@@ -85,18 +361,43 @@ def round_up_duration_seconds(call_duration: str) -> int:
         return 0
 
 
-def save_merged_csv(call_details: dict[str, CallDetail], output_path: str) -> None:
+def save_merged_csv(call_details: dict[str, CallDetail] | CallTable, output_path: str) -> None:
     """
     Save merged call details to a CSV file, including rounded durations.
+
+    Rows are written one at a time, and the rounded durations come straight
+    from each call's parsed duration. A CallTable is written in slices.
     """
     print(f"- Saving merged CSV file to {output_path}...")
-    call_details_list = []
+    if isinstance(call_details, CallTable):
+        with open(output_path, "wb") as f:
+            write_call_table_csv(call_details, f)
+        return
+
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(OUTPUT_COLUMNS)
+        for detail in call_details.values():
+            writer.writerow([*detail.to_row(), *detail.round_up_duration()])
+
+
+def write_call_table_csv(table: CallTable, buffer: BinaryIO) -> None:
+    """Write a CallTable as save_merged_csv does, in slices, to a binary file or buffer."""
+    for start in range(0, max(len(table), 1), WRITE_SLICE_ROWS):
+        part = table[start:start + WRITE_SLICE_ROWS].to_frame()
+        part.to_csv(buffer, header=not start, index=False, encoding="utf-8")
 
-    for _, detail in call_details.items():
-        call_dict = detail.to_dict()
-        call_dict["Round up duration (minutes)"] = round_up_duration_minutes(call_dict["Call duration"])
-        call_dict["Round up duration (seconds)"] = round_up_duration_seconds(call_dict["Call duration"])
-        call_details_list.append(call_dict)
 
-    df = pd.DataFrame(call_details_list)
-    df.to_csv(output_path, index=False)
+def render_merged_csv(table: CallTable) -> bytes:
+    """The processed CSV of a CallTable, built once in memory."""
+    buffer = io.BytesIO()
+    write_call_table_csv(table, buffer)
+    return buffer.getvalue()
+
+
+def save_processed_frame(processed: pd.DataFrame, output_path: str) -> None:
+    """
+    Save calls produced by process_dashboard_columnar to a CSV file.
+    """
+    print(f"- Saving merged CSV file to {output_path}...")
+    processed.to_csv(output_path, index=False)
@@ -0,0 +1,132 @@
+"""
+Compact index of calls already seen, for deduplicating large exports.
+
+Each call is packed into three int64 values (call from, call to, dial start
+in epoch nanoseconds) instead of an f-string key, and looked up through a
+64-bit hash of that triple. Hash hits are verified against the packed values
+so a collision can never drop a distinct call.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.CallTable import encode_numbers
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, applied element-wise to uint64 values."""
+    z = values.astype(np.uint64, copy=True)
+    z ^= z >> np.uint64(30)
+    z *= np.uint64(0xBF58476D1CE4E5B9)
+    z ^= z >> np.uint64(27)
+    z *= np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return z
+
+
+def hash_packed(packed: np.ndarray) -> np.ndarray:
+    """Combine the three packed columns into one 64-bit hash per call."""
+    with np.errstate(over="ignore"):
+        h = _mix(packed[:, 0].view(np.uint64))
+        h = _mix(h ^ packed[:, 1].view(np.uint64))
+        return _mix(h ^ packed[:, 2].view(np.uint64))
+
+
+class DedupIndex:
+    """
+    Set of packed call keys that grows one batch (chunk) at a time.
+
+    Keys are kept in sorted runs of hashes with their packed values in
+    parallel NumPy arrays, 32 bytes per call. Each batch becomes a new run,
+    and a run is merged into the one before it once it is as large, so
+    every key is merged O(log n) times and lookups probe O(log n) runs.
+    Numbers that do not fit an int64 (text such as "scancall", or very long
+    digit strings) are interned and stored as negative codes.
+    """
+
+    def __init__(self):
+        self._runs: list[tuple[np.ndarray, np.ndarray]] = []
+        self._collisions: set[tuple[int, int, int]] = set()
+        self._text_codes: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return sum(len(hashes) for hashes, _ in self._runs) + len(self._collisions)
+
+    def pack(
+        self,
+        call_from: pd.Series,
+        from_is_int: np.ndarray,
+        call_to: pd.Series,
+        to_is_int: np.ndarray,
+        dial_start: pd.Series,
+        from_number: Optional[np.ndarray] = None,
+        to_number: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Pack parsed numbers (text form plus integer mask, and optionally their
+        int64 values, as the columnar engine produces them) and dial start
+        times into an (n, 3) int64 array.
+        """
+        start = pd.DatetimeIndex(dial_start)
+        if start.tz is not None:
+            start = start.tz_convert("UTC").tz_localize(None)
+        packed = np.empty((len(call_from), 3), dtype=np.int64)
+        packed[:, 0] = encode_numbers(call_from, from_is_int, self._text_codes, from_number)
+        packed[:, 1] = encode_numbers(call_to, to_is_int, self._text_codes, to_number)
+        packed[:, 2] = start.as_unit("ns").asi8
+        return packed
+
+    def add(self, packed: np.ndarray) -> np.ndarray:
+        """
+        Add packed keys that are unique within the batch.
+
+        Returns:
+            np.ndarray: True where the key had not been seen in earlier batches.
+        """
+        hashes = hash_packed(packed)
+        # Probe in hash order, which walks each run front to back
+        order = np.argsort(hashes)
+        hashes, packed = hashes[order], packed[order]
+
+        hit = np.zeros(len(hashes), dtype=bool)
+        same = np.zeros(len(hashes), dtype=bool)
+        for run_hashes, run_keys in self._runs:
+            pos = np.searchsorted(run_hashes, hashes)
+            in_range = pos < len(run_hashes)
+            found = np.zeros(len(hashes), dtype=bool)
+            found[in_range] = run_hashes[pos[in_range]] == hashes[in_range]
+            hit |= found
+            same[found] = (run_keys[pos[found]] == packed[found]).all(axis=1)
+
+        new = ~same
+        # Hash matched but the call differs: fall back to an exact set
+        for i in np.flatnonzero(hit & ~same):
+            key = tuple(int(v) for v in packed[i])
+            if key in self._collisions:
+                new[i] = False
+            else:
+                self._collisions.add(key)
+        stored = new & ~hit
+        # Distinct calls sharing a hash within this batch: keep one in the runs
+        repeat = np.zeros(len(hashes), dtype=bool)
+        repeat[1:] = hashes[1:] == hashes[:-1]
+        for i in np.flatnonzero(stored & repeat):
+            self._collisions.add(tuple(int(v) for v in packed[i]))
+        stored &= ~repeat
+
+        if stored.any():
+            self._runs.append((hashes[stored], packed[stored]))
+        while len(self._runs) > 1 and len(self._runs[-2][0]) <= len(self._runs[-1][0]):
+            self._merge_last_runs()
+
+        result = np.empty(len(new), dtype=bool)
+        result[order] = new
+        return result
+
+    def _merge_last_runs(self) -> None:
+        (left_hashes, left_keys), (right_hashes, right_keys) = self._runs[-2:]
+        hashes = np.concatenate([left_hashes, right_hashes])
+        # A stable sort of two sorted runs is a linear merge
+        order = np.argsort(hashes, kind="stable")
+        self._runs[-2:] = [(hashes[order], np.concatenate([left_keys, right_keys])[order])]
@@ -1,4 +1,5 @@
 # International rates by carrier
+from src.idn_area_codes import INTERNATIONAL_PHONE_PREFIXES
 
 INTERNATIONAL_RATES = {
     "Indosat": {
@@ -126,4 +127,47 @@ INTERNATIONAL_RATES = {
         "International - GEO (Mobile)": 11500,
         "International - CUB": 17250
     },
-}
\ No newline at end of file
+}
+
+
+def normalise_rate_label(label: str) -> str:
+    """Lowercase a number-type label and collapse repeated whitespace."""
+    return " ".join(label.split()).lower()
+
+
+# Normalised "international - xxx" label -> per-minute rate, per carrier
+INTERNATIONAL_RATE_INDEX = {
+    carrier: {normalise_rate_label(label): rate for label, rate in rates.items()}
+    for carrier, rates in INTERNATIONAL_RATES.items()
+}
+
+
+def international_rates_report() -> dict[str, dict[str, list[str]]]:
+    """
+    Check INTERNATIONAL_RATES against the labels classify_number can produce.
+
+    Returns, per carrier:
+        missing: labels from INTERNATIONAL_PHONE_PREFIXES without a rate.
+        unused: rate keys no prefix produces (typos, retired countries).
+        malformed: rate keys that only match after normalisation.
+    """
+    labels = {
+        normalise_rate_label(f"International - {country}"): f"International - {country}"
+        for country in INTERNATIONAL_PHONE_PREFIXES.values()
+    }
+    report = {}
+    for carrier, rates in INTERNATIONAL_RATES.items():
+        index = INTERNATIONAL_RATE_INDEX[carrier]
+        report[carrier] = {
+            "missing": sorted(label for key, label in labels.items() if key not in index),
+            "unused": sorted(k for k in rates if normalise_rate_label(k) not in labels),
+            "malformed": sorted(k for k in rates if k != " ".join(k.split())),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    for carrier, problems in international_rates_report().items():
+        print(f"{carrier}:")
+        for kind, keys in problems.items():
+            print(f"  {kind}: {', '.join(repr(k) for k in keys) or '-'}")
@@ -0,0 +1,116 @@
+"""
+Local background job queue for the calculator.
+
+Jobs run on a bounded thread pool, so a burst of uploads queues up instead
+of saturating the server, and the Streamlit script run only submits a job
+and polls for it. Job functions must not call Streamlit: they run outside
+any script run.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+DEFAULT_WORKERS = 2
+# Finished jobs are forgotten after this long (their files stay on disk)
+DEFAULT_RETENTION_SECONDS = 24 * 60 * 60
+
+
+@dataclass
+class Job:
+    id: str
+    name: str
+    status: str = QUEUED
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    # Latest progress the job reported (see JobQueue.submit)
+    progress: Any = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def report(self, progress: Any) -> None:
+        self.progress = progress
+
+    def elapsed(self) -> float:
+        """Seconds spent running so far (or in total once finished)."""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class JobQueue:
+    """
+    Bounded pool of worker threads plus a registry of jobs by id.
+
+    Create one per server process and share it between sessions (in the app,
+    through st.cache_resource).
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, retention_seconds: float = DEFAULT_RETENTION_SECONDS):
+        self.max_workers = max_workers
+        self.retention_seconds = retention_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="calculator-job")
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, fn: Callable[..., Any], *args, report_progress: bool = False, **kwargs) -> str:
+        """
+        Queue fn(*args, **kwargs) and return the new job's id right away.
+
+        With report_progress, fn also gets an on_progress callback that
+        stores whatever it is called with as the job's progress.
+        """
+        job = Job(id=uuid.uuid4().hex[:12], name=name)
+        if report_progress:
+            kwargs["on_progress"] = job.report
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def position(self, job_id: str) -> int:
+        """How many queued jobs were submitted before this one (0 if not queued)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return 0
+            return sum(
+                1 for other in self._jobs.values()
+                if other.status == QUEUED and other.submitted_at < job.submitted_at
+            )
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        job.started_at = time.time()
+        job.status = RUNNING
+        try:
+            job.result = fn(*args, **kwargs)
+            job.status = DONE
+        except Exception as e:
+            logging.exception(f"Job {job.id} ({job.name}) failed")
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < cutoff]:
+            del self._jobs[job_id]
@@ -0,0 +1,185 @@
+"""
+Local stand-in for the Supabase client, for tests and offline runs.
+
+Covers the part of the supabase-py API the app uses: table queries
+(select/insert/update with eq, gte, lt, order, range) and storage buckets
+(upload, get_public_url). Rows live in memory and, when a root directory
+is given, are saved as one JSON file per table.
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Optional
+
+
+@dataclass
+class LocalResponse:
+    data: list[dict[str, Any]]
+    count: Optional[int] = None
+
+
+class LocalQuery:
+    def __init__(self, backend: "LocalSupabase", table: str):
+        self._backend = backend
+        self._table = table
+        self._action = "select"
+        self._columns: Optional[list[str]] = None
+        self._count = False
+        self._values: Any = None
+        self._filters: list = []
+        self._order: Optional[tuple[str, bool]] = None
+        self._range: Optional[tuple[int, int]] = None
+
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "LocalQuery":
+        self._action = "select"
+        self._columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        self._count = count is not None
+        return self
+
+    def insert(self, rows: list[dict[str, Any]] | dict[str, Any]) -> "LocalQuery":
+        self._action = "insert"
+        self._values = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, values: dict[str, Any]) -> "LocalQuery":
+        self._action = "update"
+        self._values = values
+        return self
+
+    def eq(self, column: str, value: Any) -> "LocalQuery":
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gte(self, column: str, value: Any) -> "LocalQuery":
+        self._filters.append(lambda row: row.get(column) is not None and row[column] >= value)
+        return self
+
+    def lt(self, column: str, value: Any) -> "LocalQuery":
+        self._filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "LocalQuery":
+        self._order = (column, desc)
+        return self
+
+    def range(self, start: int, end: int) -> "LocalQuery":
+        """Rows start to end, both inclusive, like PostgREST."""
+        self._range = (start, end)
+        return self
+
+    def limit(self, size: int) -> "LocalQuery":
+        start = self._range[0] if self._range else 0
+        self._range = (start, start + size - 1)
+        return self
+
+    def execute(self) -> LocalResponse:
+        with self._backend.lock:
+            rows = self._backend.rows(self._table)
+            if self._action == "insert":
+                before = len(rows)
+                try:
+                    for row in self._values:
+                        # Append before the next row takes its id, so ids stay unique
+                        rows.append(self._backend.with_id(self._table, dict(row)))
+                except ValueError:
+                    # All or nothing, like one INSERT statement
+                    del rows[before:]
+                    raise
+                inserted = rows[before:]
+                self._backend.save(self._table)
+                return LocalResponse(data=[dict(row) for row in inserted])
+
+            matched = [row for row in rows if all(f(row) for f in self._filters)]
+            if self._action == "update":
+                for row in matched:
+                    row.update(self._values)
+                self._backend.save(self._table)
+                return LocalResponse(data=[dict(row) for row in matched])
+
+            count = len(matched) if self._count else None
+            if self._order:
+                column, desc = self._order
+                matched = sorted(matched, key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+            if self._range:
+                matched = matched[self._range[0]:self._range[1] + 1]
+            if self._columns:
+                matched = [{c: row.get(c) for c in self._columns} for row in matched]
+            return LocalResponse(data=[dict(row) for row in matched], count=count)
+
+
+class LocalBucket:
+    def __init__(self, backend: "LocalSupabase", name: str):
+        self._backend = backend
+        self.name = name
+
+    def upload(self, path: str, file: bytes, file_options: Optional[dict] = None) -> dict:
+        with self._backend.lock:
+            self._backend.objects[(self.name, path)] = bytes(file)
+            if self._backend.root:
+                target = os.path.join(self._backend.root, "storage", self.name, path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, "wb") as f:
+                    f.write(file)
+        return {"path": path}
+
+    def download(self, path: str) -> bytes:
+        return self._backend.objects[(self.name, path)]
+
+    def get_public_url(self, path: str) -> str:
+        return f"local://{self.name}/{path}"
+
+
+class LocalStorage:
+    def __init__(self, backend: "LocalSupabase"):
+        self._backend = backend
+
+    def from_(self, bucket: str) -> LocalBucket:
+        return LocalBucket(self._backend, bucket)
+
+
+class LocalSupabase:
+    """
+    Drop-in for supabase.Client in the app. Inserted rows get an "id"
+    (and "request_id" for cdr_requests) when they have none.
+    """
+    ID_COLUMNS = {"cdr_requests": "request_id"}
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root
+        self.lock = threading.RLock()
+        self.tables: dict[str, list[dict[str, Any]]] = {}
+        self.objects: dict[tuple[str, str], bytes] = {}
+        self.storage = LocalStorage(self)
+        if root:
+            os.makedirs(root, exist_ok=True)
+
+    def table(self, name: str) -> LocalQuery:
+        return LocalQuery(self, name)
+
+    def rows(self, table: str) -> list[dict[str, Any]]:
+        if table not in self.tables:
+            self.tables[table] = []
+            path = self._table_path(table)
+            if path and os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    self.tables[table] = json.load(f)
+        return self.tables[table]
+
+    def with_id(self, table: str, row: dict[str, Any]) -> dict[str, Any]:
+        column = self.ID_COLUMNS.get(table, "id")
+        if row.get(column) is None:
+            row[column] = max((r.get(column) or 0 for r in self.tables[table]), default=0) + 1
+        elif any(r.get(column) == row[column] for r in self.tables[table]):
+            # Like the primary key constraint in Supabase
+            raise ValueError(f"Duplicate {column} {row[column]} in {table}")
+        return row
+
+    def save(self, table: str) -> None:
+        path = self._table_path(table)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.tables[table], f, default=str)
+
+    def _table_path(self, table: str) -> Optional[str]:
+        return os.path.join(self.root, f"{table}.json") if self.root else None
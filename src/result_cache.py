@@ -0,0 +1,267 @@
+"""
+On-disk cache of calculator results, addressed by content.
+
+Three stages are cached separately:
+- parsed: the classified, deduplicated calls of an upload (a pickled
+  CallTable), keyed by the hash of the uploaded bytes only, since parsing
+  and classification do not depend on the tariffs;
+- rated: the processed CSV, keyed by the upload hash plus a hash of the
+  canonical Files config;
+- summary: the totals and preview shown next to the CSV (a pickled
+  UploadSummary), under the same key as the rated stage.
+
+An identical request is served from the rated and summary stages without
+loading the parsed calls. A rate-only change re-rates the cached parsed
+calls instead of reading the upload again.
+The least recently used entries are evicted once the cache outgrows its
+size limit.
+"""
+import dataclasses
+import hashlib
+import io
+import json
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass, replace
+from typing import Callable, Optional
+
+import pandas as pd
+
+from src.CallTable import CallTable
+from src.charge_rules import rerate_table
+from src.csv_processing import ProgressEvent, estimate_rows, process_dashboard_chunks, render_merged_csv
+from src.FileConfig import Files
+from src.TariffPlan import compile_tariff_plan
+
+DEFAULT_CACHE_DIR = os.path.join("processed_files", "cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+PREVIEW_ROWS = 200
+STAGES = ("parsed", "rated", "summary")
+# Bump when the cached formats or the processing they store change
+CACHE_VERSION = 4
+
+# Files fields that only say where to read or write, not how to rate
+_LOCATION_FIELDS = {"dashboard", "output"}
+
+
+@dataclass
+class UploadSummary:
+    """What the calculator shows for a processed upload, small enough to cache."""
+    calls: int
+    minutes: int    # CallTable.chargeable_minutes() total
+    charge: float
+    summary: pd.DataFrame   # CallTable.charge_summary()
+    preview: pd.DataFrame   # first PREVIEW_ROWS rows as written to the CSV
+    # The rated calls, when they had to be loaded; never cached
+    table: Optional[CallTable] = None
+
+    @classmethod
+    def from_table(cls, table: CallTable, preview_rows: int = PREVIEW_ROWS) -> "UploadSummary":
+        return cls(
+            calls=len(table),
+            minutes=int(table.chargeable_minutes().sum()),
+            charge=table.total_charge(),
+            summary=table.charge_summary(),
+            preview=table[:preview_rows].to_frame(),
+        )
+
+
+def upload_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def config_key(config: Files) -> str:
+    """
+    Hash of a canonical serialisation of the config: file locations are
+    left out, call type lists are sorted, and keys are serialised in order.
+    """
+    values = {}
+    for name, value in dataclasses.asdict(config).items():
+        if name in _LOCATION_FIELDS:
+            continue
+        values[name] = sorted(value) if isinstance(value, list) else value
+    canonical = json.dumps({"version": CACHE_VERSION, "config": values}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Cache entries are plain files under root: parsed/<upload>.pkl,
+    rated/<upload>-<config>.csv and summary/<upload>-<config>.pkl. Reads refresh an entry's modification
+    time, which eviction uses as its last use.
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        for stage in STAGES:
+            os.makedirs(os.path.join(root, stage), exist_ok=True)
+
+    def _parsed_path(self, upload: str) -> str:
+        return os.path.join(self.root, "parsed", f"{upload}-v{CACHE_VERSION}.pkl")
+
+    def _rated_path(self, upload: str, config: str) -> str:
+        return os.path.join(self.root, "rated", f"{upload}-{config}.csv")
+
+    def _summary_path(self, upload: str, config: str) -> str:
+        return os.path.join(self.root, "summary", f"{upload}-{config}.pkl")
+
+    def get_parsed(self, upload: str) -> Optional[CallTable]:
+        return self._load(self._parsed_path(upload))
+
+    def put_parsed(self, upload: str, table: CallTable) -> None:
+        self._write(self._parsed_path(upload), pickle.dumps(table, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def get_summary(self, upload: str, config: str) -> Optional[UploadSummary]:
+        return self._load(self._summary_path(upload, config))
+
+    def put_summary(self, upload: str, config: str, summary: UploadSummary) -> None:
+        data = pickle.dumps(replace(summary, table=None), protocol=pickle.HIGHEST_PROTOCOL)
+        self._write(self._summary_path(upload, config), data)
+
+    def get_rated(self, upload: str, config: str) -> Optional[bytes]:
+        """The cached processed CSV, None on a miss."""
+        path = self._rated_path(upload, config)
+        if not self._touch(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # Evicted in between
+            return None
+
+    def put_rated(self, upload: str, config: str, data: bytes) -> None:
+        self._write(self._rated_path(upload, config), data)
+
+    def size(self) -> int:
+        return sum(os.path.getsize(path) for path in self._entries())
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        Remove least recently used entries until under max_bytes, never
+        removing keep. Returns how many were removed.
+        """
+        entries = sorted((p for p in self._entries() if p != keep), key=os.path.getmtime)
+        total = self.size()
+        removed = 0
+        for path in entries:
+            if total <= self.max_bytes:
+                break
+            total -= os.path.getsize(path)
+            self._remove(path)
+            removed += 1
+        return removed
+
+    def _entries(self) -> list[str]:
+        return [
+            os.path.join(self.root, stage, name)
+            for stage in STAGES
+            for name in os.listdir(os.path.join(self.root, stage))
+            if not name.startswith(".")
+        ]
+
+    def _load(self, path: str):
+        """Unpickle an entry, None on a miss."""
+        if not self._touch(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            # Evicted in between
+            return None
+        except Exception:
+            # Unreadable entry (e.g. written by an older version): drop it
+            self._remove(path)
+            return None
+
+    def _write(self, path: str, data: bytes) -> str:
+        # Write next to the target and rename, so readers never see half a file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.evict(keep=path)
+        return path
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def process_upload(
+    data: bytes,
+    config: Files,
+    cache: ResultCache,
+    on_progress: Optional[Callable[[ProgressEvent], None]] = None,
+    with_table: bool = False,
+) -> tuple[UploadSummary, bytes]:
+    """
+    Process an uploaded dashboard export through the cache.
+
+    Args:
+        data (bytes): The uploaded CSV.
+        config (Files): Calculator configuration; its dashboard and output
+            paths are not used.
+        cache (ResultCache): Cache to read from and fill.
+        on_progress (Optional[Callable[[ProgressEvent], None]]): Progress of
+            parsing, per chunk (see process_dashboard_chunks).
+        with_table (bool): Also load the rated calls into the summary's
+            table, e.g. for a what-if comparison. Without it, a request seen
+            before never touches the parsed calls.
+
+    Returns:
+        tuple[UploadSummary, bytes]: Totals and preview, and the processed
+        CSV, built once; the same bytes serve uploads and archives.
+    """
+    upload, rated_key = upload_key(data), config_key(config)
+
+    if not with_table:
+        output = cache.get_rated(upload, rated_key)
+        summary = cache.get_summary(upload, rated_key)
+        if output is not None and summary is not None:
+            if on_progress:
+                on_progress(ProgressEvent(
+                    rows=summary.calls, total_rows=summary.calls, chunks=0, calls=summary.calls,
+                    minutes=summary.minutes, charge=summary.charge, done=True,
+                ))
+            return summary, output
+
+    plan = compile_tariff_plan(config)
+    parsed = cache.get_parsed(upload)
+    if parsed is None:
+        # BytesIO over bytes shares the upload's memory instead of copying it
+        table = process_dashboard_chunks(
+            io.BytesIO(data), plan, total_rows=estimate_rows(data), on_progress=on_progress
+        )
+        cache.put_parsed(upload, table)
+    else:
+        table = rerate_table(parsed, plan)
+        if on_progress:
+            on_progress(ProgressEvent(
+                rows=len(table), total_rows=len(table), chunks=0, calls=len(table),
+                minutes=int(table.chargeable_minutes().sum()), charge=table.total_charge(), done=True,
+            ))
+
+    output = cache.get_rated(upload, rated_key)
+    if output is None:
+        output = render_merged_csv(table)
+        cache.put_rated(upload, rated_key, output)
+    summary = cache.get_summary(upload, rated_key)
+    if summary is None:
+        summary = UploadSummary.from_table(table)
+        cache.put_summary(upload, rated_key, summary)
+    return replace(summary, table=table if with_table else None), output
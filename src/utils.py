@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional
 
 from src.idn_area_codes import EMERGENCY_NUMBERS, PHONE_PREFIXES, INTERNATIONAL_PHONE_PREFIXES
@@ -25,8 +26,6 @@ def convert_to_jakarta_time_iso(original_date_str: str, region: str) -> datetime
     jakarta_date = jakarta_date.replace(tzinfo=timezone(timedelta(hours=7)))
     return jakarta_date
 
-import phonenumbers
-
 def parse_phone_number(phone_number: int | str) -> int | str:
     # If the phone number is an integer, return it directly
     if isinstance(phone_number, int):
@@ -50,6 +49,16 @@ def parse_phone_number(phone_number: int | str) -> int | str:
         return cleaned_number
 
 def classify_number(phone_number: int, call_type: str, call_from: str, call_to: str) -> str:
+    call_from_str = str(call_from)
+    return _classify_call(
+        phone_number,
+        call_type,
+        call_from == "scancall",
+        len(call_from_str) == 3 and call_from_str.isdigit(),
+    )
+
+def _classify_call(phone_number: int, call_type: str, from_scancall: bool, from_three_digits: bool) -> str:
+    # call_from only matters through the two flags, which keeps cache keys few
     phone_number_str = str(phone_number)
 
     # Classify based on call type
@@ -63,9 +72,9 @@ def classify_number(phone_number: int, call_type: str, call_from: str, call_to:
         return "Automatic Transfer"
     if call_type == "Monitoring":
         return "Monitoring"
-    if call_from == "scancall":
+    if from_scancall:
         return "scancall"
-    if call_type == "Call transfer" and len(str(call_from)) == 3 and str(call_from).isdigit():
+    if call_type == "Call transfer" and from_three_digits:
         return "Internal Call"
 
     # Check if the number is an emergency number (3, 4, or 5 digits)
@@ -74,6 +83,9 @@ def classify_number(phone_number: int, call_type: str, call_from: str, call_to:
         if classification:
             return classification
 
+    return classify_prefix(phone_number_str)
+
+def _classify_prefix_scan(phone_number_str: str) -> Optional[str]:
     # Sort prefixes by length in descending order for matching
     sorted_prefixes = sorted(map(str, PHONE_PREFIXES.keys()), key=len, reverse=True)
 
@@ -94,6 +106,73 @@ def classify_number(phone_number: int, call_type: str, call_from: str, call_to:
 
     return "Unknown number type"
 
+def _build_prefix_index() -> dict[str, Optional[str]]:
+    """
+    Map every known prefix to the label the scan above gives it.
+
+    The scan's answer for a number only depends on the longest known prefix
+    the number starts with, so resolving each prefix once up front keeps the
+    domestic > special > international precedence (and the first-listed
+    international entry winning) without scanning per number.
+    """
+    prefixes = {str(p) for p in PHONE_PREFIXES}
+    prefixes.update(str(p) for p in SPECIAL_PREFIXES)
+    prefixes.update(str(p).replace("+", "") for p in INTERNATIONAL_PHONE_PREFIXES)
+    return {prefix: _classify_prefix_scan(prefix) for prefix in prefixes}
+
+PREFIX_INDEX = _build_prefix_index()
+PREFIX_LENGTHS = sorted({len(p) for p in PREFIX_INDEX}, reverse=True)
+
+def classify_prefix(phone_number_str: str) -> Optional[str]:
+    # Longest-prefix lookup, one dict probe per known prefix length
+    for length in PREFIX_LENGTHS:
+        prefix = phone_number_str[:length]
+        if len(prefix) == length and prefix in PREFIX_INDEX:
+            return PREFIX_INDEX[prefix]
+    return "Unknown number type"
+
+CLASSIFICATION_CACHE_SIZE = 100_000
+
+parse_phone_number_cached = lru_cache(maxsize=CLASSIFICATION_CACHE_SIZE)(parse_phone_number)
+classify_call_cached = lru_cache(maxsize=CLASSIFICATION_CACHE_SIZE)(_classify_call)
+
+def parse_and_classify(call_from: str, call_to: str, call_type: str) -> tuple[int | str, int | str, Optional[str]]:
+    """
+    Parse both numbers of a call and classify it, through two bounded LRU
+    caches shared by every file processed in the same interpreter.
+
+    Numbers are memoised per raw string, so trunk numbers repeated on every
+    row are parsed once whatever they are paired with. Classification is
+    memoised on the parsed Call to and the call type, plus the only two
+    facts it reads from Call from. See classification_cache_stats for
+    hit/miss counts.
+    """
+    parsed_from = parse_phone_number_cached(call_from)
+    parsed_to = parse_phone_number_cached(call_to)
+    from_str = str(parsed_from)
+    number_type = classify_call_cached(
+        parsed_to,
+        call_type,
+        parsed_from == "scancall",
+        len(from_str) == 3 and from_str.isdigit(),
+    )
+    return parsed_from, parsed_to, number_type
+
+def classification_cache_stats() -> dict[str, dict[str, int]]:
+    """Hits, misses and size of the number and classification caches."""
+    return {
+        name: {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
+        for name, info in (
+            ("numbers", parse_phone_number_cached.cache_info()),
+            ("classification", classify_call_cached.cache_info()),
+        )
+    }
+
+def format_cache_stats(stats: dict[str, dict[str, int]]) -> str:
+    return ", ".join(
+        f"{name} {values['hits']} hits / {values['misses']} misses" for name, values in stats.items()
+    )
+
 def format_datetime_as_human_readable(datetime_object: Optional[datetime]) -> str:
     return datetime_object.strftime("%Y-%m-%d %H:%M:%S") if datetime_object else "-"
 
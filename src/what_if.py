@@ -0,0 +1,107 @@
+"""
+What-if rating: parse and classify a dashboard file once, then rate the
+same calls against several tariff configurations.
+"""
+from dataclasses import dataclass
+from typing import Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.CallTable import CallTable
+from src.charge_rules import evaluate_charge_rules, table_rating_columns
+from src.charges import from_fixed
+from src.columnar import build_call_table
+from src.csv_processing import read_dashboard_csv
+from src.FileConfig import Files
+from src.TariffPlan import TariffPlan, compile_tariff_plan
+
+COMPARISON_COLUMNS = ["Rate", "Rate type", "Charged calls", "Billed minutes", "Charge", "Difference"]
+
+
+@dataclass
+class PlanComparison:
+    """
+    Attributes:
+        totals (pd.DataFrame): One row per plan (COMPARISON_COLUMNS), in the
+            order given. "Difference" is relative to the first plan.
+        charges (Optional[pd.DataFrame]): Charge per call (rupiah), one column
+            per plan, when asked for.
+    """
+    totals: pd.DataFrame
+    charges: Optional[pd.DataFrame] = None
+
+
+def compare_plans(
+    table: CallTable,
+    plans: Mapping[str, Files | TariffPlan],
+    include_charges: bool = False,
+) -> PlanComparison:
+    """
+    Rate already processed calls against every plan.
+
+    The rating columns are prepared once and shared by all plans, so each
+    extra plan costs one pass over the charge rules.
+
+    Args:
+        table (CallTable): Processed calls, e.g. from process_dashboard_table.
+        plans (Mapping[str, Files | TariffPlan]): Plans keyed by display name.
+        include_charges (bool): Also return the per-call charge columns.
+
+    Returns:
+        PlanComparison: Per-plan totals, and optionally per-call charges.
+    """
+    if not plans:
+        raise ValueError("At least one plan is needed for a comparison")
+
+    cols = table_rating_columns(table)
+    minutes = -(-table.call_duration // 60)
+    rows, charges = {}, {}
+    for name, plan in plans.items():
+        if isinstance(plan, Files):
+            plan = compile_tariff_plan(plan)
+        units = evaluate_charge_rules(plan, cols).charges(table.call_duration)
+        charged = units > 0
+        rows[name] = {
+            "Rate": plan.rate,
+            "Rate type": plan.rate_type,
+            "Charged calls": int(charged.sum()),
+            "Billed minutes": int(minutes[charged].sum()),
+            "Charge": float(from_fixed(units.sum())),
+        }
+        if include_charges:
+            charges[name] = from_fixed(units)
+
+    totals = pd.DataFrame.from_dict(rows, orient="index")
+    totals["Difference"] = totals["Charge"] - totals["Charge"].iloc[0]
+    totals.index.name = "Plan"
+    return PlanComparison(
+        totals=totals[COMPARISON_COLUMNS],
+        charges=pd.DataFrame(charges, index=np.arange(len(table))) if include_charges else None,
+    )
+
+
+def compare_dashboard_plans(
+    dashboard,
+    plans: Mapping[str, Files | TariffPlan],
+    include_charges: bool = False,
+) -> tuple[CallTable, PlanComparison]:
+    """
+    Read and classify a dashboard export once, then compare plans on it.
+
+    Args:
+        dashboard: Path or file-like object of the export.
+        plans (Mapping[str, Files | TariffPlan]): Plans keyed by display name.
+        include_charges (bool): Also return the per-call charge columns.
+
+    Returns:
+        tuple[CallTable, PlanComparison]: The calls (rated with the first
+        plan) and the comparison.
+    """
+    if not plans:
+        raise ValueError("At least one plan is needed for a comparison")
+    first = next(iter(plans.values()))
+    plan = first if isinstance(first, TariffPlan) else compile_tariff_plan(first)
+    # The plan is given, so build_call_table never needs the Files config
+    table = build_call_table(read_dashboard_csv(dashboard), None, plan=plan)
+    return table, compare_plans(table, plans, include_charges=include_charges)